@@ -1,4 +1,5 @@
 import json
+import re
 from dataclasses import dataclass, field
 
 
@@ -17,11 +18,27 @@ ACI_SKU_STANDARD = "Standard"
 CCE_POLICY = "cGFja2FnZSBwb2xpY3kKCmFwaV9zdm4gOj0gIjAuMTAuMCIKZnJhbWV3b3JrX3N2biA6PSAiMC4xLjAiCgptb3VudF9kZXZpY2UgOj0geyJhbGxvd2VkIjogdHJ1ZX0KbW91bnRfb3ZlcmxheSA6PSB7ImFsbG93ZWQiOiB0cnVlfQpjcmVhdGVfY29udGFpbmVyIDo9IHsiYWxsb3dlZCI6IHRydWUsICJhbGxvd19zdGRpb19hY2Nlc3MiOiB0cnVlfQp1bm1vdW50X2RldmljZSA6PSB7ImFsbG93ZWQiOiB0cnVlfQp1bm1vdW50X292ZXJsYXkgOj0geyJhbGxvd2VkIjogdHJ1ZX0KZXhlY19pbl9jb250YWluZXIgOj0geyJhbGxvd2VkIjogdHJ1ZX0KZXhlY19leHRlcm5hbCA6PSB7ImFsbG93ZWQiOiB0cnVlLCAiYWxsb3dfc3RkaW9fYWNjZXNzIjogdHJ1ZX0Kc2h1dGRvd25fY29udGFpbmVyIDo9IHsiYWxsb3dlZCI6IHRydWV9CnNpZ25hbF9jb250YWluZXJfcHJvY2VzcyA6PSB7ImFsbG93ZWQiOiB0cnVlfQpwbGFuOV9tb3VudCA6PSB7ImFsbG93ZWQiOiB0cnVlfQpwbGFuOV91bm1vdW50IDo9IHsiYWxsb3dlZCI6IHRydWV9CmdldF9wcm9wZXJ0aWVzIDo9IHsiYWxsb3dlZCI6IHRydWV9CmR1bXBfc3RhY2tzIDo9IHsiYWxsb3dlZCI6IHRydWV9CnJ1bnRpbWVfbG9nZ2luZyA6PSB7ImFsbG93ZWQiOiB0cnVlfQpsb2FkX2ZyYWdtZW50IDo9IHsiYWxsb3dlZCI6IHRydWV9CnNjcmF0Y2hfbW91bnQgOj0geyJhbGxvd2VkIjogdHJ1ZX0Kc2NyYXRjaF91bm1vdW50IDo9IHsiYWxsb3dlZCI6IHRydWV9Cg=="
 
 
+def registry_password_parameter(server: str) -> str:
+    return "registryPassword" + re.sub(r"[^A-Za-z0-9]", "", server)
+
+
 def resource_id(resource_type: str, *names: str) -> str:
     quoted_names = ", ".join(f"'{name}'" for name in names)
     return f"[resourceId('{resource_type}', {quoted_names})]"
 
 
+RESOURCE_ID_PATTERN = re.compile(r"^\[resourceId\('([^']+)', (.+)\)\]$")
+
+
+def parse_resource_id(expression: str) -> tuple[str, str] | None:
+    # Inverse of resource_id, returning (type, name) with nested names joined by /
+    match = RESOURCE_ID_PATTERN.match(expression)
+    if match is None:
+        return None
+    names = re.findall(r"'([^']*)'", match.group(2))
+    return match.group(1), "/".join(names)
+
+
 def subnet_resource_id(vnet_name: str, subnet_name: str) -> str:
     return resource_id(VIRTUAL_NETWORK_SUBNET_TYPE, vnet_name, subnet_name)
 
@@ -127,12 +144,13 @@ class ResourceLoadBalancer:
     vnet_name: str
     subnet_name: str
     depends_on_vnet: bool = True
+    # One forwarding rule per container sshd when a group packs several
+    ssh_ports: list[int] = field(default_factory=lambda: [22])
 
     def to_dict(self):
         frontend_name = "LoadBalancerFrontEnd"
         backend_pool_name = "BackendPool"
         probe_name = "ssh-health-probe"
-        rule_name = "ssh-rule"
         return {
             "type": LOAD_BALANCER_TYPE,
             "apiVersion": NETWORK_API_VERSION,
@@ -173,7 +191,7 @@ class ResourceLoadBalancer:
                 ],
                 "loadBalancingRules": [
                     {
-                        "name": rule_name,
+                        "name": "ssh-rule" if port == 22 else f"ssh-rule-{port}",
                         "properties": {
                             "frontendIPConfiguration": {
                                 "id": f"[concat(resourceId('{LOAD_BALANCER_TYPE}', '{self.name}'), '/frontendIPConfigurations/{frontend_name}')]"
@@ -185,12 +203,13 @@ class ResourceLoadBalancer:
                                 "id": f"[concat(resourceId('{LOAD_BALANCER_TYPE}', '{self.name}'), '/probes/{probe_name}')]"
                             },
                             "protocol": "Tcp",
-                            "frontendPort": 22,
-                            "backendPort": 22,
+                            "frontendPort": port,
+                            "backendPort": port,
                             "enableFloatingIP": False,
                             "idleTimeoutInMinutes": 4,
                         },
                     }
+                    for port in self.ssh_ports
                 ],
             },
         }
@@ -335,6 +354,8 @@ class CACI:
     ports: list[dict] = field(
         default_factory=list
     )  # list of {"protocol": "TCP", "port": 22} dicts
+    # Containers of one group share a network namespace, so each needs its own
+    ssh_port: int = 22
 
     def to_dict(self, ssh_key=None, volume_mounts=None):
         cmd_prefix = "echo Fabric_NodeIPOrFQDN=$Fabric_NodeIPOrFQDN >> /aci_env && echo UVM_SECURITY_CONTEXT_DIR=$UVM_SECURITY_CONTEXT_DIR >> /aci_env && mkdir -p /root/.ssh/ && gpg --import /etc/pki/rpm-gpg/MICROSOFT-RPM-GPG-KEY && tdnf update -y && tdnf install -y openssh-server ca-certificates"
@@ -345,14 +366,15 @@ class CACI:
             cmd = [
                 "/bin/sh",
                 "-c",
-                f"{cmd_prefix} && echo $SSH_ADMIN_KEY >> /root/.ssh/authorized_keys && ssh-keygen -A && sed -i 's/PermitRootLogin no/PermitRootLogin yes/' /etc/ssh/sshd_config && sed -i 's/# PubkeyAuthentication yes/PubkeyAuthentication yes/' /etc/ssh/sshd_config && /usr/sbin/sshd -D",
+                f"{cmd_prefix} && echo $SSH_ADMIN_KEY >> /root/.ssh/authorized_keys && ssh-keygen -A && sed -i 's/PermitRootLogin no/PermitRootLogin yes/' /etc/ssh/sshd_config && sed -i 's/# PubkeyAuthentication yes/PubkeyAuthentication yes/' /etc/ssh/sshd_config && /usr/sbin/sshd -D"
+                + ("" if self.ssh_port == 22 else f" -p {self.ssh_port}"),
             ]
             env = [{"name": "SSH_ADMIN_KEY", "value": ssh_key}]
 
         ports = list(self.ports)  # make a copy
-        ports_contains_22 = any(p.get("port") == 22 for p in self.ports)
-        if ssh_key and not ports_contains_22:
-            ports += [{"protocol": "TCP", "port": "22"}]
+        ports_contains_ssh = any(p.get("port") == self.ssh_port for p in self.ports)
+        if ssh_key and not ports_contains_ssh:
+            ports += [{"protocol": "TCP", "port": str(self.ssh_port)}]
         return {
             "name": self.name,
             "properties": {
@@ -413,6 +435,7 @@ class ResourceACIGroup:
     vnet: ResourceVNet | None = None
     private_ip_address: str | None = None
     azure_file_mount: AzureFileMount | None = None
+    tags: dict[str, str] | None = None
 
     def to_dict(self):
         depends_on = []
@@ -450,7 +473,11 @@ class ResourceACIGroup:
                     {
                         "server": self.acr_creds["server"],
                         "username": self.acr_creds["username"],
-                        "password": self.acr_creds["password"],
+                        # A secureString parameter, so the password stays out
+                        # of the deployment history
+                        "password": "[parameters('{}')]".format(
+                            registry_password_parameter(self.acr_creds["server"])
+                        ),
                     }
                 ]
             }
@@ -486,7 +513,9 @@ class ResourceACIGroup:
             "properties": properties
             | image_crds
             | subnet,
-        } | ({"dependsOn": depends_on} if len(depends_on) > 0 else {})
+        } | ({"dependsOn": depends_on} if len(depends_on) > 0 else {}) | (
+            {"tags": self.tags} if self.tags else {}
+        )
 
 
 class ARMTemplate:
@@ -494,14 +523,39 @@ class ARMTemplate:
         self.resources = resources
         self.parameters = parameters or {}
 
+    def secure_parameter_values(self) -> dict[str, str]:
+        # Passed in a parameters file at deploy time, never in the template
+        values = {}
+        for resource in self.resources:
+            acr_creds = getattr(resource, "acr_creds", None)
+            if acr_creds:
+                values[registry_password_parameter(acr_creds["server"])] = acr_creds[
+                    "password"
+                ]
+        return values
+
     def to_dict(self):
         return {
             "$schema": "https://schema.management.azure.com/schemas/2019-04-01/deploymentTemplate.json#",
             "contentVersion": "1.0.0.0",
-            "parameters": self.parameters,
+            "parameters": self.parameters
+            | {
+                name: {"type": "secureString"}
+                for name in self.secure_parameter_values()
+            },
             "variables": {},
             "resources": [resource.to_dict() for resource in self.resources],
         }
 
     def to_json(self):
         return json.dumps(self.to_dict(), indent=4)
+
+    def dependencies(self) -> dict[tuple[str, str], set[tuple[str, str]]]:
+        # (type, name) of every resource -> the template resources it dependsOn
+        resources = self.to_dict()["resources"]
+        keys = {(r["type"], r["name"]) for r in resources}
+        graph = {}
+        for r in resources:
+            depends_on = {parse_resource_id(d) for d in r.get("dependsOn", [])}
+            graph[(r["type"], r["name"])] = {d for d in depends_on if d in keys}
+        return graph
@@ -0,0 +1,149 @@
+import datetime
+import hashlib
+import json
+import os
+import re
+import threading
+from subprocess import CalledProcessError
+
+from remote import NodeAddress
+
+
+CHECKPOINT_FORMAT_VERSION = 1
+DEFAULT_STATE_DIR = ".deploy-aci"
+# ARM error codes worth retrying rather than failing on. az prints them as
+# "(Code) message" and "Code: Code", and failed ARM deployments are reported
+# the same way.
+TRANSIENT_ERROR_CODES = (
+    "TooManyRequests",
+    "AnotherOperationInProgress",
+    "RetryableError",
+    "InternalServerError",
+    "ServiceUnavailable",
+    "GatewayTimeout",
+    "BadGateway",
+)
+# Failures az reports without an ARM error code: the status line of an HTTP
+# error response, and the exception types of dropped or timed out connections
+TRANSIENT_HTTP_STATUSES = (
+    "Too Many Requests",
+    "Internal Server Error",
+    "Bad Gateway",
+    "Service Unavailable",
+    "Gateway Timeout",
+)
+TRANSIENT_EXCEPTION_TYPES = (
+    "ConnectionResetError",
+    "ConnectionAbortedError",
+    "RemoteDisconnected",
+    "ReadTimeout",
+    "ConnectTimeout",
+    "ServiceRequestError",
+    "ServiceResponseError",
+)
+TRANSIENT_ERROR_PATTERN = re.compile(
+    "|".join(
+        [
+            r"\((?:{})\)".format("|".join(TRANSIENT_ERROR_CODES)),
+            r"^Code: (?:{})$".format("|".join(TRANSIENT_ERROR_CODES)),
+            r"invalid status '(?:{})'".format("|".join(TRANSIENT_HTTP_STATUSES)),
+            r"\b(?:{})\b".format("|".join(TRANSIENT_EXCEPTION_TYPES)),
+        ]
+    ),
+    re.MULTILINE,
+)
+
+
+def default_state_path(resource_group: str, name: str) -> str:
+    return os.path.join(DEFAULT_STATE_DIR, f"{resource_group}-{name}.json")
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    text = str(exc)
+    if isinstance(exc, CalledProcessError):
+        text += f"\n{exc.stderr or ''}\n{exc.output or ''}"
+    return TRANSIENT_ERROR_PATTERN.search(text) is not None
+
+
+def args_fingerprint(options: dict) -> str:
+    return hashlib.sha256(
+        json.dumps(options, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+class Checkpoint:
+    # Records completed deployment actions so a rerun with --resume can skip
+    # them. Written atomically after every action; safe to update from the
+    # threads running load balancer fixups.
+    def __init__(self, path: str, fingerprint: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.state = {
+            "version": CHECKPOINT_FORMAT_VERSION,
+            "fingerprint": fingerprint,
+            "completed": {},
+            "node_addresses": {},
+        }
+
+    @classmethod
+    def load(cls, path: str, fingerprint: str) -> "Checkpoint":
+        checkpoint = cls(path, fingerprint)
+        try:
+            with open(path, "r") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return checkpoint
+        if state.get("version") != CHECKPOINT_FORMAT_VERSION:
+            raise ValueError(f"{path} has unsupported version {state.get('version')}")
+        if state.get("fingerprint") != fingerprint:
+            raise ValueError(
+                f"{path} was written for different deployment arguments; "
+                "rerun without --resume to start over"
+            )
+        checkpoint.state = state
+        return checkpoint
+
+    def is_done(self, key: str) -> bool:
+        with self.lock:
+            return key in self.state["completed"]
+
+    def node_addresses(self) -> dict[str, NodeAddress]:
+        with self.lock:
+            return {
+                name: NodeAddress(**address)
+                for name, address in self.state["node_addresses"].items()
+            }
+
+    def complete(
+        self, key: str, seconds: float, node_addresses: dict[str, NodeAddress]
+    ):
+        with self.lock:
+            self.state["completed"][key] = {
+                "seconds": round(seconds, 3),
+                "completed_at": datetime.datetime.now(datetime.UTC).isoformat(),
+            }
+            self.state["node_addresses"] = {
+                name: {
+                    "name": node.name,
+                    "private_ip": node.private_ip,
+                    "public_ip": node.public_ip,
+                    "ssh_port": node.ssh_port,
+                }
+                for name, node in node_addresses.items()
+            }
+            self._save()
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def remove(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,330 @@
+import gzip
+import json
+import os
+import shlex
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from subprocess import CalledProcessError, run
+
+from remote import NodeAddress, SSHPool
+
+
+CHUNK_RETRIES = 2
+CHUNK_TIMEOUT_SECONDS = 300
+PART_SUFFIX = ".part"
+SHARE_MAX_CONNECTIONS = 8
+SUMMARY_FILE = "harvest.json"
+
+
+@dataclass
+class NodeHarvest:
+    files: int = 0
+    skipped: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    errors: list[str] = field(default_factory=list)
+    # remote path -> bytes copied, the file's size when it was listed
+    snapshot: dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class HarvestPlan:
+    resource_group: str
+    output_dir: str
+    # container group -> the containers in it
+    containers: dict[str, list[str]]
+    remote_paths: list[str]
+    chunk_bytes: int
+    # container group -> the Azure Files share mounted into it
+    shares: dict[str, str] = field(default_factory=dict)
+    storage_account_name: str | None = None
+    storage_key: str | None = None
+
+
+def list_files_command(paths: list[str]) -> str:
+    # One "<size>\t<path>" line per regular file below each path
+    return "; ".join(
+        f"find {shlex.quote(path)} -type f -printf '%s\\t%p\\n'" for path in paths
+    )
+
+
+def read_chunk_command(
+    remote_path: str, chunk_index: int, chunk_bytes: int, length: int
+) -> str:
+    # head cuts the last chunk at the listed size, so a file that keeps growing
+    # is copied as it was when listed
+    return (
+        f"dd if={shlex.quote(remote_path)} bs={chunk_bytes} skip={chunk_index} "
+        f"count=1 2>/dev/null | head -c {length} | gzip -1"
+    )
+
+
+def local_file_path(output_dir: str, node_name: str, remote_path: str) -> str:
+    return os.path.join(output_dir, node_name, "files", remote_path.lstrip("/"))
+
+
+def read_chunk(
+    pool: SSHPool,
+    node: NodeAddress,
+    remote_path: str,
+    chunk_index: int,
+    chunk_bytes: int,
+    length: int,
+) -> bytes:
+    command = read_chunk_command(remote_path, chunk_index, chunk_bytes, length)
+    for _ in range(CHUNK_RETRIES + 1):
+        result = pool.run(node, command, timeout=CHUNK_TIMEOUT_SECONDS, binary=True)
+        if result.ok:
+            return gzip.decompress(result.stdout)
+        error = result.error or f"rc={result.returncode}: {result.stderr.strip()}"
+    raise RuntimeError(f"{remote_path} chunk {chunk_index}: {error}")
+
+
+def fetch_file(
+    pool: SSHPool,
+    node: NodeAddress,
+    remote_path: str,
+    size: int,
+    destination: str,
+    chunk_bytes: int,
+) -> int | None:
+    # Returns the bytes transferred, or None if the file was already complete.
+    # Chunks are appended to a .part file, so a rerun picks up from the last
+    # whole chunk instead of starting over.
+    if os.path.exists(destination) and os.path.getsize(destination) == size:
+        return None
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    part = destination + PART_SUFFIX
+    offset = os.path.getsize(part) if os.path.exists(part) else 0
+    offset -= offset % chunk_bytes
+    if offset > size:
+        offset = 0
+    transferred = 0
+    with open(part, "ab") as f:
+        f.truncate(offset)
+        while offset < size:
+            expected = min(chunk_bytes, size - offset)
+            chunk_index = offset // chunk_bytes
+            data = read_chunk(
+                pool, node, remote_path, chunk_index, chunk_bytes, expected
+            )
+            if len(data) != expected:
+                raise RuntimeError(f"{remote_path} shrank while it was being copied")
+            f.write(data)
+            offset += expected
+            transferred += expected
+    os.replace(part, destination)
+    return transferred
+
+
+def container_logs_command(
+    resource_group: str, container_group_name: str, container_name: str
+) -> list[str]:
+    return [
+        "az",
+        "container",
+        "logs",
+        "--resource-group",
+        resource_group,
+        "--name",
+        container_group_name,
+        "--container-name",
+        container_name,
+    ]
+
+
+def fetch_container_logs(
+    plan: HarvestPlan, container_group_name: str, container_name: str
+) -> int:
+    cmd = container_logs_command(
+        plan.resource_group, container_group_name, container_name
+    )
+    print(f"Running: {shlex.join(cmd)}")
+    result = run(cmd, check=True, capture_output=True, text=True)
+    directory = os.path.join(plan.output_dir, container_group_name, "logs")
+    os.makedirs(directory, exist_ok=True)
+    with gzip.open(os.path.join(directory, f"{container_name}.log.gz"), "wt") as f:
+        f.write(result.stdout)
+    return len(result.stdout)
+
+
+def share_download_command(
+    account_name: str, share_name: str, destination: str
+) -> list[str]:
+    # The account key goes in AZURE_STORAGE_KEY so it is never printed
+    return [
+        "az",
+        "storage",
+        "file",
+        "download-batch",
+        "--account-name",
+        account_name,
+        "--source",
+        share_name,
+        "--destination",
+        destination,
+        "--max-connections",
+        str(SHARE_MAX_CONNECTIONS),
+        "--no-progress",
+        "--only-show-errors",
+    ]
+
+
+def fetch_share(plan: HarvestPlan, container_group_name: str) -> int:
+    destination = os.path.join(plan.output_dir, container_group_name, "share")
+    os.makedirs(destination, exist_ok=True)
+    cmd = share_download_command(
+        plan.storage_account_name, plan.shares[container_group_name], destination
+    )
+    print(f"Running: {shlex.join(cmd)}")
+    run(
+        cmd,
+        check=True,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "AZURE_STORAGE_KEY": plan.storage_key or ""},
+    )
+    return sum(
+        os.path.getsize(os.path.join(directory, filename))
+        for directory, _, filenames in os.walk(destination)
+        for filename in filenames
+    )
+
+
+def list_remote_files(
+    pool: SSHPool, nodes: list[NodeAddress], paths: list[str], max_parallel: int
+) -> dict[str, tuple[list[tuple[str, int]], str | None]]:
+    # node name -> ([(path, size)], error). find still lists the paths that
+    # exist when others are missing, so keep its output either way.
+    listings = {}
+    command = list_files_command(paths)
+    for result in pool.run_all(nodes, command, max_parallel, timeout=120):
+        files = []
+        for line in result.stdout.splitlines():
+            size, _, path = line.partition("\t")
+            if path:
+                files.append((path, int(size)))
+        error = None
+        if not result.ok:
+            error = result.error or result.stderr.strip() or f"rc={result.returncode}"
+        listings[result.node.name] = (files, error)
+    return listings
+
+
+def print_harvest_commands(plan: HarvestPlan, pool: SSHPool, nodes: list[NodeAddress]):
+    # The files to copy are only known once the nodes have been listed
+    for name, containers in plan.containers.items():
+        for container in containers:
+            cmd = container_logs_command(plan.resource_group, name, container)
+            print(f"Running: {shlex.join(cmd)}")
+        if name in plan.shares:
+            cmd = share_download_command(
+                plan.storage_account_name,
+                plan.shares[name],
+                os.path.join(plan.output_dir, name, "share"),
+            )
+            print(f"Running: {shlex.join(cmd)}")
+    if plan.remote_paths:
+        for node in nodes:
+            pool.run(node, list_files_command(plan.remote_paths))
+
+
+def run_harvest(
+    plan: HarvestPlan,
+    pool: SSHPool | None,
+    nodes: list[NodeAddress],
+    max_parallel: int,
+) -> dict[str, NodeHarvest]:
+    # Logs and shares are per container group, remote files per SSH node;
+    # the two only differ when groups hold several containers
+    stats = {name: NodeHarvest() for name in plan.containers}
+    for node in nodes:
+        stats.setdefault(node.name, NodeHarvest())
+    lock = threading.Lock()
+
+    def task(name, label, fn, *args, snapshot=None):
+        start = time.monotonic()
+        try:
+            transferred = fn(*args)
+        except (
+            CalledProcessError,
+            OSError,
+            RuntimeError,
+            ValueError,
+            EOFError,
+            zlib.error,
+        ) as e:
+            detail = getattr(e, "stderr", None) or str(e)
+            with lock:
+                stats[name].errors.append(f"{label}: {detail.strip()}")
+            return
+        with lock:
+            node = stats[name]
+            node.seconds += time.monotonic() - start
+            if snapshot is not None:
+                node.snapshot[label] = snapshot
+            if transferred is None:
+                node.skipped += 1
+            else:
+                node.files += 1
+                node.bytes += transferred
+
+    listings = {}
+    if plan.remote_paths and nodes:
+        listings = list_remote_files(pool, nodes, plan.remote_paths, max_parallel)
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as executor:
+        for name, containers in plan.containers.items():
+            for container in containers:
+                executor.submit(
+                    task,
+                    name,
+                    f"logs {container}",
+                    fetch_container_logs,
+                    plan,
+                    name,
+                    container,
+                )
+            if name in plan.shares:
+                executor.submit(
+                    task, name, f"share {plan.shares[name]}", fetch_share, plan, name
+                )
+        for node in nodes:
+            files, error = listings.get(node.name, ([], None))
+            if error is not None:
+                stats[node.name].errors.append(f"listing: {error}")
+            for remote_path, size in files:
+                executor.submit(
+                    task,
+                    node.name,
+                    remote_path,
+                    fetch_file,
+                    pool,
+                    node,
+                    remote_path,
+                    size,
+                    local_file_path(plan.output_dir, node.name, remote_path),
+                    plan.chunk_bytes,
+                    snapshot=size,
+                )
+
+    os.makedirs(plan.output_dir, exist_ok=True)
+    with open(os.path.join(plan.output_dir, SUMMARY_FILE), "w") as f:
+        json.dump(
+            {
+                name: {
+                    "files": node.files,
+                    "skipped": node.skipped,
+                    "bytes": node.bytes,
+                    "seconds": round(node.seconds, 3),
+                    "errors": node.errors,
+                    "snapshot": node.snapshot,
+                }
+                for name, node in stats.items()
+            },
+            f,
+            indent=2,
+        )
+    return stats
@@ -0,0 +1,142 @@
+import json
+import sys
+import threading
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+# deploy-aci flags that only make sense for the whole manifest run
+MANIFEST_ONLY_FLAGS = {"--manifest": 1, "--max-deployments": 1, "--report": 1}
+
+
+def load_manifest(path: str) -> dict:
+    with open(path, "r") as f:
+        text = f.read()
+    if path.endswith((".yaml", ".yml")):
+        if yaml is None:
+            raise ValueError("YAML manifests require PyYAML (pip install pyyaml)")
+        manifest = yaml.safe_load(text)
+    else:
+        manifest = json.loads(text)
+    if isinstance(manifest, list):
+        manifest = {"deployments": manifest}
+    if not isinstance(manifest, dict) or not isinstance(
+        manifest.get("deployments"), list
+    ):
+        raise ValueError("manifest must contain a list of deployments")
+    if len(manifest["deployments"]) == 0:
+        raise ValueError("manifest contains no deployments")
+    for idx, entry in enumerate(manifest["deployments"]):
+        if not isinstance(entry, dict):
+            raise ValueError(f"deployment #{idx + 1} must be a mapping of flags")
+        if "name" not in entry:
+            raise ValueError(f"deployment #{idx + 1} requires a name")
+    return manifest
+
+
+def options_to_argv(options: dict) -> list[str]:
+    argv = []
+    for key, value in options.items():
+        flag = "--" + key.replace("_", "-")
+        if flag in MANIFEST_ONLY_FLAGS:
+            raise ValueError(f"{flag} cannot be set inside a manifest")
+        if value is None or value is False:
+            continue
+        if value is True:
+            argv.append(flag)
+        elif isinstance(value, list):
+            for item in value:
+                argv += [flag, str(item)]
+        else:
+            argv += [flag, str(value)]
+    return argv
+
+
+def strip_manifest_flags(argv: list[str]) -> list[str]:
+    stripped = []
+    skip = 0
+    for arg in argv:
+        if skip:
+            skip -= 1
+            continue
+        flag, separator, _ = arg.partition("=")
+        if flag in MANIFEST_ONLY_FLAGS:
+            skip = 0 if separator else MANIFEST_ONLY_FLAGS[flag]
+            continue
+        stripped.append(arg)
+    return stripped
+
+
+def deployment_argvs(manifest: dict, cli_argv: list[str]) -> list[tuple[str, list[str]]]:
+    # Later flags win: manifest defaults, then the command line, then the entry
+    defaults = options_to_argv(manifest.get("defaults") or {})
+    common = strip_manifest_flags(cli_argv)
+    return [
+        (str(entry["name"]), defaults + common + options_to_argv(entry))
+        for entry in manifest["deployments"]
+    ]
+
+
+class PrefixedOutput:
+    # Stands in for sys.stdout while deployments run concurrently, tagging
+    # every complete line with the deployment the writing thread belongs to.
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def set_prefix(self, prefix: str | None):
+        self.local.prefix = prefix
+        self.local.buffer = ""
+
+    def write(self, text: str) -> int:
+        prefix = getattr(self.local, "prefix", None)
+        if prefix is None:
+            with self.lock:
+                return self.stream.write(text)
+        self.local.buffer += text
+        *lines, self.local.buffer = self.local.buffer.split("\n")
+        if lines:
+            with self.lock:
+                self.stream.write("".join(f"[{prefix}] {line}\n" for line in lines))
+                self.stream.flush()
+        return len(text)
+
+    def flush(self):
+        prefix = getattr(self.local, "prefix", None)
+        if prefix is not None and self.local.buffer:
+            with self.lock:
+                self.stream.write(f"[{prefix}] {self.local.buffer}\n")
+            self.local.buffer = ""
+        with self.lock:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def install_prefixed_output() -> PrefixedOutput:
+    output = PrefixedOutput(sys.stdout)
+    sys.stdout = output
+    return output
+
+
+def inherit_output_prefix(fn):
+    # Wraps fn so worker threads it runs on keep the submitting deployment's prefix
+    output = sys.stdout
+    if not isinstance(output, PrefixedOutput):
+        return fn
+    prefix = getattr(output.local, "prefix", None)
+
+    def wrapper(*args, **kwargs):
+        output.set_prefix(prefix)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            output.flush()
+            output.set_prefix(None)
+
+    return wrapper
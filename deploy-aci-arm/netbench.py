@@ -0,0 +1,259 @@
+import json
+import shlex
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from remote import NodeAddress, RemoteResult, SSHPool
+from utils import SSH_PORT
+
+
+LATENCY_SAMPLES = 10
+READY_TIMEOUT_SECONDS = 600
+READY_POLL_SECONDS = 10
+SINK_IDLE_SECONDS = 600
+PATHS = ("private", "public")
+
+# Accepts connections, drains them and acknowledges EOF so the sender can time
+# the transfer. Exits by itself once idle, in case it is never killed.
+SINK_SCRIPT = """
+import socket, sys, threading
+server = socket.create_server(("", int(sys.argv[1])))
+server.settimeout(float(sys.argv[2]))
+def drain(conn):
+    with conn:
+        conn.settimeout(60)
+        while conn.recv(1 << 16):
+            pass
+        conn.sendall(b"ok")
+while True:
+    try:
+        conn, _ = server.accept()
+    except socket.timeout:
+        break
+    threading.Thread(target=drain, args=(conn,), daemon=True).start()
+"""
+
+# Runs on the source node: TCP connect latency to every target, and a timed
+# bulk transfer to targets with a sink port
+PROBE_SCRIPT = """
+import json, socket, sys, time
+results = {}
+for spec in json.loads(sys.argv[1]):
+    result = results[spec["path"]] = {}
+    rtts = []
+    for _ in range(spec["samples"]):
+        start = time.perf_counter()
+        try:
+            with socket.create_connection((spec["host"], spec["latency_port"]), timeout=5):
+                rtts.append(time.perf_counter() - start)
+        except OSError as e:
+            result["error"] = str(e)
+            break
+    if rtts:
+        rtts.sort()
+        result["latency_ms"] = rtts[len(rtts) // 2] * 1e3
+        result["latency_min_ms"] = rtts[0] * 1e3
+    if spec.get("throughput_port") and rtts:
+        payload = bytes(1 << 16)
+        try:
+            with socket.create_connection((spec["host"], spec["throughput_port"]), timeout=10) as s:
+                s.settimeout(120)
+                start = time.perf_counter()
+                remaining = spec["bytes"]
+                while remaining > 0:
+                    s.sendall(payload[: min(remaining, len(payload))])
+                    remaining -= min(remaining, len(payload))
+                s.shutdown(socket.SHUT_WR)
+                s.recv(16)
+                seconds = time.perf_counter() - start
+            result["throughput_mbps"] = spec["bytes"] * 8 / seconds / 1e6
+        except OSError as e:
+            result["error"] = str(e)
+print(json.dumps(results))
+"""
+
+
+def probe_rounds(count: int) -> list[list[tuple[int, int]]]:
+    # Round r pairs every node i with node i + r, so each node sends one probe
+    # and receives one per round and transfers never share an endpoint
+    return [
+        [(source, (source + shift) % count) for source in range(count)]
+        for shift in range(1, count)
+    ]
+
+
+def sink_port(node: NodeAddress, port: int) -> int:
+    # Containers sharing a group's IPs shift the sink port by the same offset
+    # as their SSH port, so their sinks never collide
+    return port + node.ssh_port - SSH_PORT
+
+
+def probe_command(target: NodeAddress, port: int, payload_bytes: int) -> str:
+    specs = [
+        {
+            "path": "private",
+            "host": target.private_ip,
+            "latency_port": target.ssh_port,
+            "samples": LATENCY_SAMPLES,
+            "throughput_port": sink_port(target, port),
+            "bytes": payload_bytes,
+        },
+        {
+            # The load balancers only forward SSH, so only latency goes public
+            "path": "public",
+            "host": target.public_ip,
+            "latency_port": target.ssh_port,
+            "samples": LATENCY_SAMPLES,
+        },
+    ]
+    return shlex.join(["python3", "-c", PROBE_SCRIPT, json.dumps(specs)])
+
+
+def sink_command(port: int) -> str:
+    sink = shlex.join(["python3", "-c", SINK_SCRIPT, str(port), str(SINK_IDLE_SECONDS)])
+    return f"nohup {sink} >/dev/null 2>&1 </dev/null & echo $!"
+
+
+def result_error(result: RemoteResult) -> str | None:
+    if result.error is not None:
+        return result.error
+    if result.returncode != 0:
+        return f"rc={result.returncode}: {result.stderr.strip()}"
+    return None
+
+
+def wait_until_reachable(
+    pool: SSHPool, nodes: list[NodeAddress], max_parallel: int, timeout: float
+):
+    deadline = time.monotonic() + timeout
+    pending = list(nodes)
+    while True:
+        results = pool.run_all(pending, "true", max_parallel, timeout=30)
+        pending = [result.node for result in results if not result.ok]
+        if not pending:
+            return
+        if time.monotonic() >= deadline:
+            raise RuntimeError(
+                "nodes not reachable over SSH: "
+                + ", ".join(node.name for node in pending)
+            )
+        print(f"Waiting for {len(pending)}/{len(nodes)} nodes to accept SSH")
+        time.sleep(READY_POLL_SECONDS)
+
+
+def run_network_benchmark(
+    pool: SSHPool,
+    nodes: list[NodeAddress],
+    port: int,
+    payload_bytes: int,
+    max_parallel: int,
+) -> dict:
+    wait_until_reachable(pool, nodes, max_parallel, READY_TIMEOUT_SECONDS)
+    sinks = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as executor:
+        started = list(
+            executor.map(
+                lambda node: pool.run(
+                    node, sink_command(sink_port(node, port)), timeout=30
+                ),
+                nodes,
+            )
+        )
+    for result in started:
+        error = result_error(result)
+        if error is not None:
+            raise RuntimeError(f"{result.node.name}: failed to start sink ({error})")
+        sinks[result.node.name] = result.stdout.strip()
+
+    pairs = []
+    try:
+        rounds = probe_rounds(len(nodes))
+        with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as executor:
+            for idx, round_pairs in enumerate(rounds):
+                start = time.monotonic()
+                results = list(
+                    executor.map(
+                        lambda pair: pool.run(
+                            nodes[pair[0]],
+                            probe_command(nodes[pair[1]], port, payload_bytes),
+                            timeout=300,
+                        ),
+                        round_pairs,
+                    )
+                )
+                for (source, target), result in zip(round_pairs, results):
+                    error = result_error(result)
+                    if error is None:
+                        try:
+                            probes = json.loads(result.stdout)
+                        except json.JSONDecodeError as e:
+                            error = f"invalid probe output: {e}"
+                    if error is not None:
+                        probes = {path: {"error": error} for path in PATHS}
+                    pairs.append(
+                        {
+                            "source": nodes[source].name,
+                            "target": nodes[target].name,
+                            **probes,
+                        }
+                    )
+                print(
+                    f"Round {idx + 1}/{len(rounds)}: {len(round_pairs)} probes "
+                    f"in {time.monotonic() - start:.1f}s"
+                )
+    finally:
+        for node in nodes:
+            if sinks.get(node.name):
+                pool.run(node, f"kill {sinks[node.name]}", timeout=30)
+
+    return {
+        "nodes": [
+            {
+                "name": node.name,
+                "private_ip": node.private_ip,
+                "public_ip": node.public_ip,
+                "ssh_port": node.ssh_port,
+                "throughput_port": sink_port(node, port),
+            }
+            for node in nodes
+        ],
+        "latency_samples": LATENCY_SAMPLES,
+        "payload_bytes": payload_bytes,
+        "pairs": pairs,
+        "matrices": {
+            "private_latency_ms": metric_matrix(nodes, pairs, "private", "latency_ms"),
+            "public_latency_ms": metric_matrix(nodes, pairs, "public", "latency_ms"),
+            "private_throughput_mbps": metric_matrix(
+                nodes, pairs, "private", "throughput_mbps"
+            ),
+        },
+    }
+
+
+def metric_matrix(
+    nodes: list[NodeAddress], pairs: list[dict], path: str, metric: str
+) -> list[list[float | None]]:
+    # Row is the probing node, column the node it probed
+    index = {node.name: i for i, node in enumerate(nodes)}
+    matrix = [[None] * len(nodes) for _ in nodes]
+    for pair in pairs:
+        value = pair.get(path, {}).get(metric)
+        if value is not None:
+            matrix[index[pair["source"]]][index[pair["target"]]] = round(value, 3)
+    return matrix
+
+
+def format_matrices(report: dict) -> str:
+    names = [node["name"] for node in report["nodes"]]
+    width = max(10, *(len(name) for name in names))
+    lines = []
+    for title, matrix in report["matrices"].items():
+        lines.append(f"{title} (row -> column):")
+        lines.append(" " * width + "".join(f" {name:>{width}}" for name in names))
+        for i, (name, row) in enumerate(zip(names, matrix)):
+            cells = [
+                "-" if i == j else ("err" if value is None else f"{value:.3f}")
+                for j, value in enumerate(row)
+            ]
+            lines.append(f"{name:<{width}}" + "".join(f" {c:>{width}}" for c in cells))
+    return "\n".join(lines)
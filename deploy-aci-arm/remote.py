@@ -0,0 +1,237 @@
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class NodeAddress:
+    # One SSH endpoint: a container group, or one container of a group when
+    # several share the group's IPs on their own SSH ports
+    name: str
+    private_ip: str
+    public_ip: str
+    ssh_port: int = 22
+
+
+def persistent_control_dir() -> str:
+    return os.path.join(tempfile.gettempdir(), f"deploy-aci-ssh-{os.getuid()}")
+
+
+@dataclass
+class RemoteResult:
+    node: NodeAddress
+    returncode: int | None
+    stdout: str | bytes
+    stderr: str
+    seconds: float
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.returncode == 0
+
+
+class SSHPool:
+    # Keeps one multiplexed OpenSSH master connection per node so repeated
+    # commands against the same node skip the TCP and key exchange handshake.
+    def __init__(
+        self,
+        ssh_key_path: str,
+        user: str = "root",
+        connect_timeout: int = 10,
+        persist: str = "300s",
+        dry_run: bool = False,
+        control_dir: str | None = None,
+    ):
+        self.ssh_key_path = ssh_key_path
+        self.user = user
+        self.connect_timeout = connect_timeout
+        self.persist = persist
+        self.dry_run = dry_run
+        # With a fixed control_dir the master connections outlive this pool, so
+        # the next invocation within the persist window skips the handshake
+        self.keep_masters = control_dir is not None
+        if control_dir is None:
+            self.control_dir = tempfile.mkdtemp(prefix="aci-ssh-")
+        else:
+            os.makedirs(control_dir, mode=0o700, exist_ok=True)
+            self.control_dir = control_dir
+        self._hosts: set[tuple[str, int]] = set()
+
+    def ssh_options(self, port: int) -> list[str]:
+        return [
+            "-i",
+            self.ssh_key_path,
+            "-p",
+            str(port),
+            "-o",
+            "BatchMode=yes",
+            "-o",
+            "StrictHostKeyChecking=no",
+            "-o",
+            "UserKnownHostsFile=/dev/null",
+            "-o",
+            "LogLevel=ERROR",
+            "-o",
+            f"ConnectTimeout={self.connect_timeout}",
+            "-o",
+            "ControlMaster=auto",
+            "-o",
+            f"ControlPath={self.control_dir}/%C",
+            "-o",
+            f"ControlPersist={self.persist}",
+        ]
+
+    def ssh_cmd(self, node: NodeAddress, remote_command: str) -> list[str]:
+        self._hosts.add((node.public_ip, node.ssh_port))
+        return (
+            ["ssh"]
+            + self.ssh_options(node.ssh_port)
+            + [f"{self.user}@{node.public_ip}", remote_command]
+        )
+
+    def run(
+        self,
+        node: NodeAddress,
+        remote_command: str,
+        timeout: float | None = None,
+        binary: bool = False,
+    ) -> RemoteResult:
+        # binary leaves stdout as bytes, eg for file contents
+        cmd = self.ssh_cmd(node, remote_command)
+        empty = b"" if binary else ""
+        if self.dry_run:
+            print(shlex.join(cmd))
+            return RemoteResult(node, 0, empty, "", 0.0)
+        start = time.monotonic()
+        try:
+            result = subprocess.run(
+                cmd,
+                capture_output=True,
+                timeout=timeout,
+                stdin=subprocess.DEVNULL,
+            )
+        except subprocess.TimeoutExpired as e:
+            stdout = e.stdout or b""
+            return RemoteResult(
+                node,
+                None,
+                stdout if binary else stdout.decode(errors="replace"),
+                (e.stderr or b"").decode(errors="replace"),
+                time.monotonic() - start,
+                error=f"timed out after {timeout}s",
+            )
+        return RemoteResult(
+            node,
+            result.returncode,
+            result.stdout if binary else result.stdout.decode(errors="replace"),
+            result.stderr.decode(errors="replace"),
+            time.monotonic() - start,
+        )
+
+    def stream(
+        self,
+        node: NodeAddress,
+        remote_command: str,
+        on_line: Callable[[str, str], None],
+        timeout: float | None = None,
+    ) -> RemoteResult:
+        # Like run, but hands every output line to on_line("stdout"|"stderr",
+        # line) as it arrives instead of capturing it
+        cmd = self.ssh_cmd(node, remote_command)
+        if self.dry_run:
+            print(shlex.join(cmd))
+            return RemoteResult(node, 0, "", "", 0.0)
+        start = time.monotonic()
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            stdin=subprocess.DEVNULL,
+            text=True,
+            errors="replace",
+        )
+
+        def pump(pipe, name):
+            for line in pipe:
+                on_line(name, line.rstrip("\n"))
+
+        readers = [
+            threading.Thread(target=pump, args=(process.stdout, "stdout"), daemon=True),
+            threading.Thread(target=pump, args=(process.stderr, "stderr"), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+        error = None
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            error = f"timed out after {timeout}s"
+        for reader in readers:
+            reader.join(timeout=5)
+        return RemoteResult(
+            node,
+            None if error else process.returncode,
+            "",
+            "",
+            time.monotonic() - start,
+            error=error,
+        )
+
+    def run_all(
+        self,
+        nodes: list[NodeAddress],
+        remote_command: str,
+        max_parallel: int,
+        timeout: float | None = None,
+        on_result: Callable[[RemoteResult], None] | None = None,
+    ) -> list[RemoteResult]:
+        results = []
+        with ThreadPoolExecutor(max_workers=max(1, max_parallel)) as pool:
+            futures = [
+                pool.submit(self.run, node, remote_command, timeout) for node in nodes
+            ]
+            for future in as_completed(futures):
+                result = future.result()
+                if on_result is not None:
+                    on_result(result)
+                results.append(result)
+        order = {node.name: i for i, node in enumerate(nodes)}
+        return sorted(results, key=lambda r: order[r.node.name])
+
+    def close(self):
+        if self.keep_masters:
+            self._hosts.clear()
+            return
+        for host, port in self._hosts if not self.dry_run else ():
+            subprocess.run(
+                [
+                    "ssh",
+                    "-o",
+                    f"ControlPath={self.control_dir}/%C",
+                    "-p",
+                    str(port),
+                    "-O",
+                    "exit",
+                    f"{self.user}@{host}",
+                ],
+                capture_output=True,
+                check=False,
+            )
+        self._hosts.clear()
+        shutil.rmtree(self.control_dir, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
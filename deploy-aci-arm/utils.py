@@ -1,13 +1,16 @@
 import argparse
 from collections.abc import Callable
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 import hashlib
+import math
 import os
 import sys
 import textwrap
 
 import arm_template_builder as tb
+from checkpoint import Checkpoint
+from remote import NodeAddress
 
 
 @dataclass
@@ -16,6 +19,13 @@ class ActionContext:
     verbose: bool
     use_existing_resource_group: bool
     storage_key: str | None = None
+    node_addresses: dict[str, NodeAddress] = field(default_factory=dict)
+    # (action kind, seconds) for every executed action, in order
+    action_timings: list[tuple[str, float]] = field(default_factory=list)
+    checkpoint: Checkpoint | None = None
+    retries: int = 0
+    # {"server", "username", "password"} for pulling images from a registry
+    registry_credentials: dict[str, str] | None = None
 
 
 class DeploymentActionKind(Enum):
@@ -27,6 +37,14 @@ class DeploymentActionKind(Enum):
     LOAD_BALANCER_BACKEND_FIXUP = "load_balancer_backend_fixup"
     PRINT_SSH_ACCESS = "print_ssh_access"
     PRINT_IP_MAPPING = "print_ip_mapping"
+    COLLECT_ATTESTATIONS = "collect_attestations"
+    CONTAINER_REGISTRY = "create_container_registry"
+    IMPORT_IMAGE = "import_image"
+    FETCH_REGISTRY_CREDENTIALS = "fetch_registry_credentials"
+    NETWORK_BENCHMARK = "network_benchmark"
+    REMOTE_EXEC = "remote_exec"
+    HARVEST = "harvest"
+    SEED_STORAGE_SHARES = "seed_storage_shares"
 
 
 class DeploymentAction:
@@ -35,10 +53,24 @@ class DeploymentAction:
 
 
 class DeployArmAction(DeploymentAction):
-    def __init__(self, resource_group: str, template):
+    def __init__(
+        self,
+        resource_group: str,
+        template,
+        deployment_name: str | None = None,
+        followups: list[tuple[set[tuple[str, str]], DeploymentAction]] | None = None,
+        max_parallel: int = 16,
+        fail_fast: bool = False,
+    ):
         super().__init__(DeploymentActionKind.DEPLOY_ARM)
         self.resource_group = resource_group
         self.template = template
+        self.deployment_name = deployment_name
+        # Actions run as soon as all of their (resource type, name) have succeeded,
+        # while the rest of the template is still deploying
+        self.followups = followups or []
+        self.max_parallel = max_parallel
+        self.fail_fast = fail_fast
 
 
 class ResourceGroupAction(DeploymentAction):
@@ -71,6 +103,20 @@ class StorageShareAction(DeploymentAction):
         self.share_name = share_name
 
 
+class SeedStorageSharesAction(DeploymentAction):
+    def __init__(
+        self,
+        account_name: str,
+        share_sources: dict[str, str],
+        max_parallel: int,
+    ):
+        super().__init__(DeploymentActionKind.SEED_STORAGE_SHARES)
+        self.account_name = account_name
+        # share name -> local directory uploaded into it
+        self.share_sources = share_sources
+        self.max_parallel = max_parallel
+
+
 class FetchStorageAccountKeyAction(DeploymentAction):
     def __init__(self, resource_group: str, account_name: str):
         super().__init__(DeploymentActionKind.FETCH_STORAGE_ACCOUNT_KEY)
@@ -103,11 +149,13 @@ class PrintSSHAccessAction(DeploymentAction):
         resource_group: str,
         ssh_key_path: str,
         public_ip_names: list[str],
+        ssh_ports: list[int] | None = None,
     ):
         super().__init__(DeploymentActionKind.PRINT_SSH_ACCESS)
         self.resource_group = resource_group
         self.ssh_key_path = ssh_key_path
         self.public_ip_names = public_ip_names
+        self.ssh_ports = ssh_ports or [SSH_PORT]
 
 
 class PrintIPMappingAction(DeploymentAction):
@@ -123,10 +171,151 @@ class PrintIPMappingAction(DeploymentAction):
         self.public_ip_names = public_ip_names
 
 
+class CollectAttestationsAction(DeploymentAction):
+    def __init__(
+        self,
+        resource_group: str,
+        container_group_names: list[str],
+        public_ip_names: list[str],
+        container_names: dict[str, list[str]],
+        ssh_ports: list[int],
+        ssh_key_path: str,
+        archive_path: str,
+        remote_command: str,
+        max_parallel: int,
+    ):
+        super().__init__(DeploymentActionKind.COLLECT_ATTESTATIONS)
+        self.resource_group = resource_group
+        self.container_group_names = container_group_names
+        self.public_ip_names = public_ip_names
+        self.container_names = container_names
+        self.ssh_ports = ssh_ports
+        self.ssh_key_path = ssh_key_path
+        self.archive_path = archive_path
+        self.remote_command = remote_command
+        self.max_parallel = max_parallel
+
+
+class NetworkBenchmarkAction(DeploymentAction):
+    def __init__(
+        self,
+        resource_group: str,
+        container_group_names: list[str],
+        public_ip_names: list[str],
+        container_names: dict[str, list[str]],
+        ssh_ports: list[int],
+        ssh_key_path: str,
+        report_path: str,
+        port: int,
+        payload_bytes: int,
+        max_parallel: int,
+    ):
+        super().__init__(DeploymentActionKind.NETWORK_BENCHMARK)
+        self.resource_group = resource_group
+        self.container_group_names = container_group_names
+        self.public_ip_names = public_ip_names
+        self.container_names = container_names
+        self.ssh_ports = ssh_ports
+        self.ssh_key_path = ssh_key_path
+        self.report_path = report_path
+        self.port = port
+        self.payload_bytes = payload_bytes
+        self.max_parallel = max_parallel
+
+
+class RemoteExecAction(DeploymentAction):
+    def __init__(
+        self,
+        resource_group: str,
+        container_group_names: list[str],
+        public_ip_names: list[str],
+        container_names: dict[str, list[str]],
+        ssh_ports: list[int],
+        ssh_key_path: str,
+        remote_command: str,
+        max_parallel: int,
+        timeout: float | None,
+    ):
+        super().__init__(DeploymentActionKind.REMOTE_EXEC)
+        self.resource_group = resource_group
+        self.container_group_names = container_group_names
+        self.public_ip_names = public_ip_names
+        self.container_names = container_names
+        self.ssh_ports = ssh_ports
+        self.ssh_key_path = ssh_key_path
+        self.remote_command = remote_command
+        self.max_parallel = max_parallel
+        self.timeout = timeout
+
+
+class HarvestAction(DeploymentAction):
+    def __init__(
+        self,
+        resource_group: str,
+        container_group_names: list[str],
+        public_ip_names: list[str],
+        container_names: dict[str, list[str]],
+        ssh_ports: list[int],
+        ssh_key_path: str,
+        output_dir: str,
+        remote_paths: list[str],
+        shares: dict[str, str],
+        storage_account_name: str | None,
+        chunk_bytes: int,
+        max_parallel: int,
+    ):
+        super().__init__(DeploymentActionKind.HARVEST)
+        self.resource_group = resource_group
+        self.container_group_names = container_group_names
+        self.public_ip_names = public_ip_names
+        self.container_names = container_names
+        self.ssh_ports = ssh_ports
+        self.ssh_key_path = ssh_key_path
+        self.output_dir = output_dir
+        self.remote_paths = remote_paths
+        self.shares = shares
+        self.storage_account_name = storage_account_name
+        self.chunk_bytes = chunk_bytes
+        self.max_parallel = max_parallel
+
+
+class ContainerRegistryAction(DeploymentAction):
+    def __init__(self, resource_group: str, registry_name: str, region: str, sku: str):
+        super().__init__(DeploymentActionKind.CONTAINER_REGISTRY)
+        self.resource_group = resource_group
+        self.registry_name = registry_name
+        self.region = region
+        self.sku = sku
+
+
+class ImportImageAction(DeploymentAction):
+    def __init__(
+        self,
+        resource_group: str,
+        registry_name: str,
+        source_image: str,
+        target_image: str,
+    ):
+        super().__init__(DeploymentActionKind.IMPORT_IMAGE)
+        self.resource_group = resource_group
+        self.registry_name = registry_name
+        self.source_image = source_image
+        self.target_image = target_image
+
+
+class FetchRegistryCredentialsAction(DeploymentAction):
+    def __init__(self, registry_name: str, enable_admin: bool):
+        super().__init__(DeploymentActionKind.FETCH_REGISTRY_CREDENTIALS)
+        self.registry_name = registry_name
+        # Only for the --acr-cache registry, which deploy-aci manages itself
+        self.enable_admin = enable_admin
+
+
 @dataclass(frozen=True)
 class ParsedAzureFileMount:
     share_name: str
     mount_path: str
+    source_dir: str | None = None
 
 
 def effective_deployment_resource_group(args: argparse.Namespace) -> str:
@@ -145,7 +334,7 @@ def parse_azure_file_mount_spec(spec: str) -> ParsedAzureFileMount:
         if separator == "":
             raise ValueError("must use key=value pairs separated by commas")
         normalized_key = key.strip()
-        if normalized_key not in {"share", "path"}:
+        if normalized_key not in {"share", "path", "source"}:
             raise ValueError(f"contains unsupported key '{normalized_key}'")
         if normalized_key in values:
             raise ValueError(f"contains duplicate key '{normalized_key}'")
@@ -153,9 +342,11 @@ def parse_azure_file_mount_spec(spec: str) -> ParsedAzureFileMount:
 
     share_name = values.get("share", "").strip()
     mount_path = values.get("path", "").strip()
+    source_dir = values.get("source", "").strip()
     return ParsedAzureFileMount(
         share_name=share_name,
         mount_path=mount_path,
+        source_dir=os.path.expanduser(source_dir) if source_dir else None,
     )
 
 
@@ -171,12 +362,27 @@ def validate_parsed_azure_file_mount(
         parser.error(f"{mount_label} requires path=<absolute-path>")
     if not mount.mount_path.startswith("/"):
         parser.error(f"{mount_label} path must be an absolute path")
+    if mount.source_dir is not None and not os.path.isdir(mount.source_dir):
+        parser.error(f"{mount_label} source {mount.source_dir} is not a directory")
 
 
 def derived_share_name(share_prefix: str, node_index: int) -> str:
     return f"{share_prefix.rstrip('-')}-{node_index + 1}"
 
 
+def node_share_name(args: argparse.Namespace, cidx: int) -> str:
+    mount_specs = args.azure_file_mount
+    mount_spec = mount_specs[0] if len(mount_specs) == 1 else mount_specs[cidx]
+    mount = parse_azure_file_mount_spec(mount_spec)
+    if args.azure_file_share_prefix:
+        return derived_share_name(mount.share_name, cidx)
+    return mount.share_name
+
+
+def container_name(args: argparse.Namespace, cidx: int, container_index: int) -> str:
+    return f"{args.name}-{cidx}-{container_index}"
+
+
 def derived_storage_account_name(args: argparse.Namespace) -> str:
     seed = f"{effective_deployment_resource_group(args)}-{args.name}".lower()
     sanitized = "".join(ch for ch in seed if ch.isalnum())
@@ -227,11 +433,7 @@ def build_per_node_azure_file_share(
             )
         )
 
-    share_name = (
-        derived_share_name(mount.share_name, cidx)
-        if args.azure_file_share_prefix
-        else mount.share_name
-    )
+    share_name = node_share_name(args, cidx)
     share_id = (storage_account_name, share_name)
     if "storage_shares" not in build_context:
         build_context["storage_shares"] = set()
@@ -244,6 +446,8 @@ def build_per_node_azure_file_share(
                 share_name=share_name,
             )
         )
+        if mount.source_dir is not None:
+            build_context.setdefault("share_sources", {})[share_name] = mount.source_dir
 
     def build_mount(context: ActionContext) -> tb.AzureFileMount:
         return tb.AzureFileMount(
@@ -257,6 +461,164 @@ def build_per_node_azure_file_share(
     return build_mount
 
 
+ACR_LOGIN_SUFFIX = ".azurecr.io"
+
+
+def split_image_reference(image: str) -> tuple[str, str, str]:
+    # Returns (registry host, repository, tag), following docker's defaults
+    first, separator, rest = image.partition("/")
+    if separator and ("." in first or ":" in first or first == "localhost"):
+        host, remainder = first, rest
+    else:
+        host, remainder = "docker.io", image
+        if "/" not in remainder:
+            remainder = f"library/{remainder}"
+    if "@" in remainder:
+        repository, _, digest = remainder.partition("@")
+        return host, repository, digest.replace(":", "-")[:19]
+    repository, separator, tag = remainder.rpartition(":")
+    if not separator or "/" in tag:
+        return host, remainder, "latest"
+    return host, repository, tag
+
+
+def acr_registry_name(image: str) -> str | None:
+    host, _, _ = split_image_reference(image)
+    if host.endswith(ACR_LOGIN_SUFFIX):
+        return host[: -len(ACR_LOGIN_SUFFIX)]
+    return None
+
+
+def acr_resource_group(args: argparse.Namespace) -> str:
+    return args.acr_resource_group or effective_deployment_resource_group(args)
+
+
+def derived_registry_name(resource_group: str, region: str) -> str:
+    # One cache per resource group and region, shared by every deployment there
+    seed = f"{resource_group}-{region}".lower()
+    sanitized = "".join(ch for ch in seed if ch.isalnum())
+    digest = hashlib.sha1(seed.encode("utf-8")).hexdigest()[:6]
+    return f"aci{sanitized[:41]}{digest}"
+
+
+def cache_registry_name(args: argparse.Namespace) -> str | None:
+    if not args.acr_cache:
+        return None
+    return args.acr_name or derived_registry_name(acr_resource_group(args), args.region)
+
+
+def cached_image_tag(image: str) -> str:
+    _, repository, tag = split_image_reference(image)
+    return f"{repository}:{tag}"
+
+
+def cached_image_name(registry_name: str, image: str) -> str:
+    return f"{registry_name}{ACR_LOGIN_SUFFIX}/{cached_image_tag(image)}"
+
+
+def deployed_image_name(args: argparse.Namespace, image: str) -> str:
+    registry_name = cache_registry_name(args)
+    if registry_name is None:
+        return image
+    return cached_image_name(registry_name, image)
+
+
+def build_registry_actions(
+    args: argparse.Namespace, build_context: dict[str, object]
+) -> None:
+    registry_name = cache_registry_name(args)
+    if registry_name is not None:
+        resource_group = acr_resource_group(args)
+        build_context["actions"].append(
+            ContainerRegistryAction(
+                resource_group=resource_group,
+                registry_name=registry_name,
+                region=args.region,
+                sku=args.acr_sku,
+            )
+        )
+        if args.image:
+            build_context["actions"].append(
+                ImportImageAction(
+                    resource_group=resource_group,
+                    registry_name=registry_name,
+                    source_image=args.image,
+                    target_image=cached_image_tag(args.image),
+                )
+            )
+    elif args.azure_auth:
+        registry_name = acr_registry_name(args.image)
+    if registry_name is not None:
+        build_context["actions"].append(
+            FetchRegistryCredentialsAction(
+                registry_name=registry_name, enable_admin=bool(args.acr_cache)
+            )
+        )
+
+
+SSH_PORT = 22
+
+
+def resource_amounts(value: str) -> list[int | float]:
+    # --cpus/--ram: one amount for the whole group, or one per container
+    amounts = []
+    for part in value.split(","):
+        amount = float(part)
+        if amount <= 0:
+            raise argparse.ArgumentTypeError(f"{part} is not a positive amount")
+        amounts.append(int(amount) if amount.is_integer() else amount)
+    return amounts
+
+
+def container_amounts(amounts: list[int | float], containers: int) -> list[int | float]:
+    # A single amount is the group's total, split evenly and rounded down to
+    # 0.01 so the containers never ask for more than the group was given
+    if len(amounts) > 1:
+        return amounts
+    share = math.floor(amounts[0] * 100 / containers) / 100
+    return [int(share) if share.is_integer() else share] * containers
+
+
+def requested_ports(args: argparse.Namespace) -> list[dict]:
+    ports = []
+    for p in (args.tcp_ports or "").split(","):
+        p = p.strip()
+        if p:
+            ports.append({"protocol": "TCP", "port": int(p)})
+    for p in (args.udp_ports or "").split(","):
+        p = p.strip()
+        if p:
+            ports.append({"protocol": "UDP", "port": int(p)})
+    return ports
+
+
+def container_port_offset(args: argparse.Namespace, container_index: int) -> int:
+    return container_index * args.container_port_offset
+
+
+def offset_ports(ports: list[dict], offset: int) -> list[dict]:
+    return [{"protocol": p["protocol"], "port": p["port"] + offset} for p in ports]
+
+
+def container_ssh_ports(args: argparse.Namespace) -> list[int]:
+    return [
+        SSH_PORT + container_port_offset(args, container_index)
+        for container_index in range(args.containers_per_group)
+    ]
+
+
+def group_container_names(
+    args: argparse.Namespace, container_group_names: list[str]
+) -> dict[str, list[str]]:
+    return {
+        name: [
+            container_name(args, int(name.rsplit("-", 1)[1]) - 1, container_index)
+            for container_index in range(args.containers_per_group)
+        ]
+        for name in container_group_names
+    }
+
+
 def get_ssh_key(ssh_key: str) -> str:
     with open(os.path.expanduser(ssh_key), "r") as f:
         return f.read().strip()
@@ -337,6 +699,16 @@ def new_vnet_with_nat(
     return [pub_ip, nat_gateway, nsg, vnet]
 
 
+POOL_TAG = "deploy-aci-pool"
+POOL_CLAIM_TAG = "deploy-aci-pool-claim"
+POOL_IMAGE_TAG = "deploy-aci-pool-image"
+
+
+def pool_tags(pool_name: str, claim: str, pool_image: str) -> dict[str, str]:
+    # The idle image is kept on every node so a release can restore it
+    return {POOL_TAG: pool_name, POOL_CLAIM_TAG: claim, POOL_IMAGE_TAG: pool_image}
+
+
 def load_balancer_name(container_group_name: str) -> str:
     return f"{container_group_name}-lb"
 
@@ -355,6 +727,24 @@ def ssh_private_key_path(ssh_key_path: str) -> str:
     return ssh_key_path
 
 
+def selected_container_group_names(args: argparse.Namespace) -> list[str]:
+    # --nodes takes 1-based node numbers or container group names
+    names = [f"{args.name}-{cidx + 1}" for cidx in range(args.num_containers)]
+    if not args.nodes:
+        return names
+    selected = []
+    for token in args.nodes.split(","):
+        token = token.strip()
+        if not token:
+            continue
+        name = f"{args.name}-{token}" if token.isdigit() else token
+        if name not in names:
+            raise ValueError(f"{token} is not one of {', '.join(names)}")
+        if name not in selected:
+            selected.append(name)
+    return selected
+
+
 def default_container_name():
     return f"test-{os.urandom(2).hex()}"
 
@@ -375,6 +765,9 @@ deploy-aci --image ghcr.io/myrepo/myimage --resource-group my-rg --name deploy3
 Deploy a 2-node cluster into a managed derived resource group with one shared storage account and per-node Azure Files shares:
 deploy-aci --image ghcr.io/myrepo/myimage --resource-group-prefix my-rg --name cluster2 --ssh-key ~/.ssh/id_rsa.pub --sku standard --num-containers 2 --azure-file-share-prefix --azure-file-mount share=workspace,path=/mnt/workspace
 
+Seed every node's share with a local dataset before the containers start:
+deploy-aci --image ghcr.io/myrepo/myimage --resource-group-prefix my-rg --name cluster2 --ssh-key ~/.ssh/id_rsa.pub --sku standard --num-containers 2 --azure-file-share-prefix --azure-file-mount share=workspace,path=/mnt/workspace,source=./dataset
+
 Use premium Azure Files backing storage for the deployment-created storage account:
 deploy-aci --image ghcr.io/myrepo/myimage --resource-group-prefix my-rg --name cluster2 --ssh-key ~/.ssh/id_rsa.pub --sku standard --azure-file-account-sku Premium_LRS --azure-file-mount share=workspace,path=/mnt/workspace
 
@@ -383,21 +776,90 @@ deploy-aci --image ghcr.io/myrepo/myimage --resource-group cluster2-rg --name cl
 
 Delete a managed deployment by deleting its target resource group:
 deploy-aci --resource-group-prefix my-rg --name cluster2 --delete
+
+Delete only the resources of a deployment in a shared resource group:
+deploy-aci --resource-group my-rg --name deploy1 --num-containers 2 --use-existing-resource-group --delete
+
+Deploy every entry of a manifest concurrently, at most 3 at a time, sharing the image and SSH key:
+deploy-aci --manifest regions.yaml --image ghcr.io/myrepo/myimage --ssh-key ~/.ssh/id_rsa.pub --max-deployments 3 --report regions-report.json
+
+Keep a warm pool of 8 idle nodes, claim 3 of them for a benchmark image, then return them:
+deploy-aci --image ghcr.io/myrepo/idle --resource-group-prefix my-rg --name pool --ssh-key ~/.ssh/id_rsa.pub --num-containers 8 --pool
+deploy-aci --image ghcr.io/myrepo/bench --resource-group-prefix my-rg --name pool --ssh-key ~/.ssh/id_rsa.pub --num-containers 8 --claim 3 --claim-name run1
+deploy-aci --resource-group-prefix my-rg --name pool --ssh-key ~/.ssh/id_rsa.pub --num-containers 8 --release run1
+
+Pack 4 workers into each of 2 container groups, splitting 4 CPUs unevenly and 16 GB of RAM evenly; the second worker of each group listens for SSH on port 1022:
+deploy-aci --image ghcr.io/myrepo/myimage --resource-group-prefix my-rg --name packed --ssh-key ~/.ssh/id_rsa.pub --sku standard --num-containers 2 --containers-per-group 4 --cpus 1.5,1,1,0.5 --ram 16 --tcp-ports 22,8000
+
+Cache the image in a registry in the deployment region so every node pulls it from nearby:
+deploy-aci --image ghcr.io/myrepo/myimage --resource-group-prefix my-rg --name cluster2 --ssh-key ~/.ssh/id_rsa.pub --num-containers 8 --acr-cache --acr-resource-group my-acr-rg
+
+Pick a failed deployment back up where it stopped, skipping completed actions:
+deploy-aci --image ghcr.io/myrepo/myimage --resource-group-prefix my-rg --name cluster2 --ssh-key ~/.ssh/id_rsa.pub --num-containers 2 --resume
+
+Run a command on nodes 1 and 3 of an existing deployment, 2 at a time, with output prefixed by node:
+deploy-aci --resource-group-prefix my-rg --name cluster2 --ssh-key ~/.ssh/id_rsa.pub --num-containers 4 --exec "uptime && df -h /" --nodes 1,3 --max-parallel 2
+
+Harvest container logs, /results from every node and each node's Azure Files share into ./harvest (rerun to resume):
+deploy-aci --resource-group-prefix my-rg --name cluster2 --ssh-key ~/.ssh/id_rsa.pub --num-containers 2 --azure-file-share-prefix --azure-file-mount share=workspace,path=/mnt/workspace --harvest ./harvest --harvest-path /results --harvest-shares
+
+Collect attestation evidence from every node of an existing deployment into one JSONL archive:
+deploy-aci --resource-group-prefix my-rg --name cluster2 --ssh-key ~/.ssh/id_rsa.pub --num-containers 2 --collect-attestations evidence.jsonl
 """
 )
 
 
-def build_parser() -> argparse.ArgumentParser:
+DEFAULT_ATTESTATION_COMMAND = (
+    "python3 /scripts/stash_attestation_and_endorsements.py --bins /tools --output-format json"
+)
+
+
+def build_parser(prog: str | None = None) -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
+        prog=prog,
         formatter_class=argparse.RawDescriptionHelpFormatter,
         description="Start up a ACI deployment with sensible defaults.",
         epilog=EPILOG,
     )
     parser.add_argument("--image", help="The image to use for all containers")
     parser.add_argument(
-        "--azure-auth", help="Use az command to do authentication", action="store_true"
+        "--azure-auth",
+        help=(
+            "Use az command to do authentication: container groups pull --image from its "
+            "Azure Container Registry with the registry's admin credentials"
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "--acr-cache",
+        action="store_true",
+        help=(
+            "Import --image once into an Azure Container Registry in --region (created "
+            "if missing) and have every container group pull from it. Enables the "
+            "registry's admin user, whose credentials the container groups pull with"
+        ),
+    )
+    parser.add_argument(
+        "--acr-name",
+        default=None,
+        help="Registry used by --acr-cache. Defaults to one derived from its resource group and region",
+    )
+    parser.add_argument(
+        "--acr-resource-group",
+        default=None,
+        help=(
+            "Resource group holding the --acr-cache registry, so deployments can share it. "
+            "Defaults to the deployment resource group"
+        ),
+    )
+    parser.add_argument(
+        "--acr-sku",
+        choices=["Basic", "Standard", "Premium"],
+        default="Standard",
+        help="SKU for a registry created by --acr-cache",
     )
-    resource_group_group = parser.add_mutually_exclusive_group(required=True)
+    # One of these is required, but may come from --manifest entries instead
+    resource_group_group = parser.add_mutually_exclusive_group()
     resource_group_group.add_argument(
         "--resource-group",
         help="Deploy into this exact resource group name.",
@@ -426,15 +888,23 @@ def build_parser() -> argparse.ArgumentParser:
     )
     parser.add_argument(
         "--cpus",
-        type=int,
-        help="The number of CPUs to allocate to each container",
-        default=4,
+        type=resource_amounts,
+        help=(
+            "The number of CPUs to allocate to each container group, split evenly "
+            "across --containers-per-group, or a comma separated list with one value "
+            "per container of a group"
+        ),
+        default="4",
     )
     parser.add_argument(
         "--ram",
-        type=int,
-        help="The amount of RAM (GB) to allocate to each container",
-        default=16,
+        type=resource_amounts,
+        help=(
+            "The amount of RAM (GB) to allocate to each container group, split evenly "
+            "across --containers-per-group, or a comma separated list with one value "
+            "per container of a group"
+        ),
+        default="16",
     )
     parser.add_argument(
         "--tcp-ports",
@@ -453,6 +923,24 @@ def build_parser() -> argparse.ArgumentParser:
         default=1,
         help="Number of container groups to deploy",
     )
+    parser.add_argument(
+        "--containers-per-group",
+        type=int,
+        default=1,
+        help=(
+            "Number of worker containers packed into each container group. They "
+            "share the group's IP, load balancer and network namespace"
+        ),
+    )
+    parser.add_argument(
+        "--container-port-offset",
+        type=int,
+        default=1000,
+        help=(
+            "Added to every --tcp-ports/--udp-ports port (and the SSH port) once "
+            "per container index within a group, so co-located containers do not clash"
+        ),
+    )
     parser.add_argument(
         "--dry-run",
         action="store_true",
@@ -468,7 +956,19 @@ def build_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "--delete",
         action="store_true",
-        help="Delete the target resource group for this deployment when managed by deploy-aci",
+        help=(
+            "Delete the target resource group for this deployment when managed by deploy-aci. "
+            "With --use-existing-resource-group, delete only the resources this deployment "
+            "creates, in reverse dependency order."
+        ),
+    )
+    parser.add_argument(
+        "--wait",
+        action="store_true",
+        help=(
+            "With --delete, wait until the resource group is gone, printing progress. "
+            "Resource-level deletes with --use-existing-resource-group always wait."
+        ),
     )
     parser.add_argument(
         "--use-existing-resource-group",
@@ -484,7 +984,8 @@ def build_parser() -> argparse.ArgumentParser:
         default=[],
         help=(
             "Repeatable Azure Files mount spec using key=value pairs. "
-            "Supported keys: share, path. "
+            "Supported keys: share, path, source (a local directory uploaded into the "
+            "share before the containers start). "
             "One mount broadcasts to all nodes; multiple mounts must match --num-containers. "
             "deploy-aci always creates one new storage account per deployment and reuses it across nodes."
         ),
@@ -505,6 +1006,177 @@ def build_parser() -> argparse.ArgumentParser:
             "Common values: Standard_LRS (default) and Premium_LRS."
         ),
     )
+    parser.add_argument(
+        "--collect-attestations",
+        metavar="ARCHIVE",
+        default=None,
+        help=(
+            "Instead of deploying, SSH into every node of the existing deployment in parallel, "
+            "run --attestation-command and append each node's evidence to this JSONL archive."
+        ),
+    )
+    parser.add_argument(
+        "--attestation-command",
+        default=DEFAULT_ATTESTATION_COMMAND,
+        help="Remote command printing one JSON attestation document, used by --collect-attestations",
+    )
+    parser.add_argument(
+        "--exec",
+        metavar="COMMAND",
+        default=None,
+        help=(
+            "Instead of deploying, run this shell command over SSH on the nodes of the "
+            "existing deployment, up to --max-parallel at once, streaming each line "
+            "prefixed with its node and reporting every node's exit code and time"
+        ),
+    )
+    parser.add_argument(
+        "--nodes",
+        default=None,
+        help=(
+            "Comma separated node numbers (1-based) or container group names that "
+            "--exec runs on. Defaults to every node"
+        ),
+    )
+    parser.add_argument(
+        "--exec-timeout",
+        type=float,
+        default=None,
+        help="Seconds after which --exec gives up on a node",
+    )
+    parser.add_argument(
+        "--harvest",
+        metavar="DIR",
+        default=None,
+        help=(
+            "Instead of deploying, download every container's logs and the "
+            "--harvest-path paths of every node of the existing deployment into "
+            "DIR/<node>/, up to --max-parallel transfers at once. Rerun to resume"
+        ),
+    )
+    parser.add_argument(
+        "--harvest-path",
+        action="append",
+        default=[],
+        help="Remote file or directory copied by --harvest from each node. Repeatable",
+    )
+    parser.add_argument(
+        "--harvest-shares",
+        action="store_true",
+        help="Also download each node's --azure-file-mount share with --harvest",
+    )
+    parser.add_argument(
+        "--harvest-chunk-mb",
+        type=int,
+        default=8,
+        help="Size of the gzip compressed chunks --harvest copies remote files in",
+    )
+    parser.add_argument(
+        "--network-benchmark",
+        metavar="REPORT",
+        default=None,
+        help=(
+            "Once every node accepts SSH, probe latency and throughput between every "
+            "pair of nodes over the private network and the load balancer public IPs, "
+            "and write the NxN matrices to this JSON file. Runs after a deployment, or "
+            "against the existing deployment when --image is not given"
+        ),
+    )
+    parser.add_argument(
+        "--network-benchmark-port",
+        type=int,
+        default=5201,
+        help="Port the --network-benchmark throughput sink listens on inside each node",
+    )
+    parser.add_argument(
+        "--network-benchmark-mb",
+        type=int,
+        default=64,
+        help="MB sent per node pair by the --network-benchmark throughput probe",
+    )
+    parser.add_argument(
+        "--max-parallel",
+        type=int,
+        default=16,
+        help="Maximum number of nodes or resources to operate on concurrently",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help=(
+            "Skip the actions a previous run of this deployment completed, as recorded "
+            "in its --state-file, and continue from the first incomplete one"
+        ),
+    )
+    parser.add_argument(
+        "--state-file",
+        default=None,
+        help=(
+            "Where to record completed actions for --resume. "
+            "Defaults to .deploy-aci/<resource-group>-<name>.json"
+        ),
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        default=2,
+        help="Retry each action up to this many times on transient Azure errors",
+    )
+    parser.add_argument(
+        "--fail-fast",
+        action="store_true",
+        help="Cancel the ARM deployment as soon as any of its resources fails",
+    )
+    parser.add_argument(
+        "--pool",
+        action="store_true",
+        help=(
+            "Deploy as a warm pool named --name: every container group is tagged as an "
+            "idle pool member running --image, ready for --claim"
+        ),
+    )
+    parser.add_argument(
+        "--claim",
+        type=int,
+        default=None,
+        metavar="N",
+        help=(
+            "Claim N idle nodes of the existing pool --name and redeploy only their "
+            "container groups with --image, reusing the pool's network and load balancers"
+        ),
+    )
+    parser.add_argument(
+        "--claim-name",
+        default=None,
+        help="Label recorded on the nodes taken by --claim, used to --release them",
+    )
+    parser.add_argument(
+        "--release",
+        default=None,
+        metavar="CLAIM_NAME",
+        help="Return the pool nodes claimed under this label to the pool's idle image",
+    )
+    parser.add_argument(
+        "--manifest",
+        default=None,
+        help=(
+            "JSON or YAML file listing deployments, each a mapping of deploy-aci flags "
+            "(eg name, region, sku, num-containers) on top of the manifest's defaults "
+            "and the other command line flags. All deployments are planned up front "
+            "and run concurrently."
+        ),
+    )
+    parser.add_argument(
+        "--max-deployments",
+        type=int,
+        default=4,
+        help="Maximum number of --manifest deployments to run at once",
+    )
+    parser.add_argument(
+        "--report",
+        default=None,
+        help="Write the consolidated --manifest IP mapping and timing report to this JSON file",
+    )
     parser.add_argument(
         "--access-mode",
         choices=["exec", "ssh-lb"],
@@ -552,8 +1224,78 @@ def validate_args(parser: argparse.ArgumentParser, args: argparse.Namespace) ->
             file=sys.stderr,
         )
 
-    if not args.delete and not args.image:
-        parser.error("--image is required unless --delete is set")
+    if args.manifest is not None:
+        # Each manifest entry is parsed and validated as its own deployment
+        if args.max_deployments < 1:
+            parser.error("--max-deployments must be at least 1")
+        return
+
+    if args.resource_group is None and args.resource_group_prefix is None:
+        parser.error(
+            "one of the arguments --resource-group --resource-group-prefix is required"
+        )
+
+    modes = [
+        flag
+        for flag, value in [
+            ("--delete", args.delete),
+            ("--collect-attestations", args.collect_attestations),
+            ("--pool", args.pool),
+            ("--claim", args.claim is not None),
+            ("--release", args.release),
+            ("--exec", args.exec is not None),
+            ("--harvest", args.harvest),
+        ]
+        if value
+    ]
+    if len(modes) > 1:
+        parser.error(f"{' and '.join(modes)} are mutually exclusive")
+
+    if (
+        not args.delete
+        and not args.collect_attestations
+        and not args.release
+        and not args.network_benchmark
+        and args.exec is None
+        and not args.harvest
+        and not args.image
+    ):
+        parser.error(
+            "--image is required unless --delete, --collect-attestations, --release, "
+            "--exec, --harvest or --network-benchmark is set"
+        )
+
+    if args.nodes and args.exec is None and not args.harvest:
+        parser.error("--nodes requires --exec or --harvest")
+    try:
+        selected_container_group_names(args)
+    except ValueError as exc:
+        parser.error(f"--nodes {exc}")
+    if (args.harvest_path or args.harvest_shares) and not args.harvest:
+        parser.error("--harvest-path and --harvest-shares require --harvest")
+    if args.harvest_shares and not args.azure_file_mount:
+        parser.error("--harvest-shares requires the deployment's --azure-file-mount")
+    if args.harvest_chunk_mb < 1:
+        parser.error("--harvest-chunk-mb must be at least 1")
+    if args.exec is not None:
+        if args.exec_timeout is not None and args.exec_timeout <= 0:
+            parser.error("--exec-timeout must be positive")
+
+    if args.network_benchmark:
+        if modes:
+            parser.error(f"--network-benchmark cannot be combined with {modes[0]}")
+        if args.network_benchmark_mb < 1:
+            parser.error("--network-benchmark-mb must be at least 1")
+
+    if args.claim is not None:
+        if args.claim < 1:
+            parser.error("--claim must be at least 1")
+        if args.claim > args.num_containers:
+            parser.error("--claim cannot exceed the pool's --num-containers")
+        if not args.claim_name:
+            parser.error("--claim requires --claim-name")
+    elif args.claim_name:
+        parser.error("--claim-name requires --claim")
 
     if not args.delete and not args.ssh_key:
         parser.error("--ssh-key is required unless --delete is set")
@@ -561,8 +1303,70 @@ def validate_args(parser: argparse.ArgumentParser, args: argparse.Namespace) ->
     if args.num_containers < 1:
         parser.error("--num-containers must be at least 1")
 
-    if args.delete and args.use_existing_resource_group:
-        parser.error("--delete does not support --use-existing-resource-group")
+    if args.max_parallel < 1:
+        parser.error("--max-parallel must be at least 1")
+
+    if args.containers_per_group < 1:
+        parser.error("--containers-per-group must be at least 1")
+    for flag, amounts in (("--cpus", args.cpus), ("--ram", args.ram)):
+        if len(amounts) not in (1, args.containers_per_group):
+            parser.error(
+                f"{flag} takes one value or one per container (--containers-per-group)"
+            )
+        if not all(container_amounts(amounts, args.containers_per_group)):
+            parser.error(
+                f"{flag} {amounts[0]} is too small to split across "
+                f"{args.containers_per_group} containers"
+            )
+    try:
+        ports = requested_ports(args)
+    except ValueError:
+        parser.error("--tcp-ports and --udp-ports must be comma separated integers")
+    if args.containers_per_group > 1:
+        if args.container_port_offset < 1:
+            parser.error("--container-port-offset must be at least 1")
+        ports.append({"protocol": "TCP", "port": SSH_PORT})
+        opened = set()
+        for container_index in range(args.containers_per_group):
+            offset = container_port_offset(args, container_index)
+            keys = {(p["protocol"], p["port"]) for p in offset_ports(ports, offset)}
+            for protocol, port in sorted(keys):
+                if port > 65535:
+                    parser.error(
+                        f"--container-port-offset puts container {container_index} "
+                        f"port {port - offset} beyond 65535"
+                    )
+                if (protocol, port) in opened:
+                    parser.error(
+                        f"{protocol} port {port} of container {container_index} "
+                        "clashes with another container; raise --container-port-offset"
+                    )
+            opened |= keys
+
+    if args.azure_auth and not args.acr_cache and args.image and acr_registry_name(
+        args.image
+    ) is None:
+        parser.error(
+            f"--azure-auth requires an --image on *{ACR_LOGIN_SUFFIX} or --acr-cache"
+        )
+
+    if (args.acr_name or args.acr_resource_group) and not args.acr_cache:
+        parser.error("--acr-name and --acr-resource-group require --acr-cache")
+
+    if args.retries < 0:
+        parser.error("--retries cannot be negative")
+
+    if args.resume and (
+        args.delete
+        or args.collect_attestations
+        or args.release
+        or args.exec is not None
+        or args.harvest
+    ):
+        parser.error("--resume only applies to deployments")
+
+    if args.resume and args.claim is not None:
+        parser.error("--resume only applies to deployments")
 
     if args.use_existing_resource_group and args.resource_group_prefix is not None:
         parser.error(
@@ -0,0 +1,174 @@
+import datetime
+import hashlib
+from dataclasses import dataclass
+
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from cryptography.hazmat.primitives.asymmetric.utils import encode_dss_signature
+
+from snp_report import SNPReport
+
+
+# The report signature covers everything before it, and is an ECDSA P-384
+# signature with r and s stored as little-endian 72 byte fields.
+REPORT_SIGNED_SIZE = 0x2A0
+REPORT_SIGNATURE_COMPONENT_SIZE = 72
+
+
+def fingerprint(cert: x509.Certificate) -> str:
+    return cert.fingerprint(hashes.SHA256()).hex()
+
+
+def cert_to_pem(cert: x509.Certificate) -> str:
+    return cert.public_bytes(serialization.Encoding.PEM).decode("utf-8")
+
+
+@dataclass(frozen=True)
+class VerifiedChain:
+    vcek: x509.Certificate
+    ask: x509.Certificate
+    ark: x509.Certificate
+
+    @property
+    def fingerprints(self) -> dict[str, str]:
+        return {
+            "vcek": fingerprint(self.vcek),
+            "ask": fingerprint(self.ask),
+            "ark": fingerprint(self.ark),
+        }
+
+
+class ChainVerifier:
+    def __init__(self):
+        # sha256 of the encoded input -> parsed certificate(s)
+        self._parsed: dict[bytes, list[x509.Certificate]] = {}
+        # (subject fingerprint, issuer fingerprint) -> error, or None when valid
+        self._signatures: dict[tuple[str, str], str | None] = {}
+        # (report sha256, vcek fingerprint) -> error, or None when valid
+        self._reports: dict[tuple[bytes, str], str | None] = {}
+
+    def load_der(self, der: bytes) -> x509.Certificate:
+        key = hashlib.sha256(der).digest()
+        if key not in self._parsed:
+            self._parsed[key] = [x509.load_der_x509_certificate(der, default_backend())]
+        return self._parsed[key][0]
+
+    def load_pem_chain(self, pem: str | bytes) -> list[x509.Certificate]:
+        if isinstance(pem, str):
+            pem = pem.encode("utf-8")
+        key = hashlib.sha256(pem).digest()
+        if key not in self._parsed:
+            self._parsed[key] = x509.load_pem_x509_certificates(pem)
+        return self._parsed[key]
+
+    def load_pem(self, pem: str | bytes) -> x509.Certificate:
+        certs = self.load_pem_chain(pem)
+        if len(certs) != 1:
+            raise ValueError(f"expected a single certificate, got {len(certs)}")
+        return certs[0]
+
+    def split_chain(self, chain_pem: str | bytes) -> tuple[x509.Certificate, x509.Certificate]:
+        certs = self.load_pem_chain(chain_pem)
+        if len(certs) != 2:
+            raise ValueError(f"expected ASK and ARK in chain, got {len(certs)} certificates")
+        roots = [c for c in certs if c.subject == c.issuer]
+        if len(roots) != 1:
+            raise ValueError("expected exactly one self-signed ARK in chain")
+        ark = roots[0]
+        ask = certs[0] if certs[1] is ark else certs[1]
+        return ask, ark
+
+    def verify_chain(
+        self,
+        vcek: x509.Certificate,
+        ask: x509.Certificate,
+        ark: x509.Certificate,
+        now: datetime.datetime | None = None,
+    ) -> VerifiedChain:
+        now = now or datetime.datetime.now(datetime.UTC)
+        for name, cert in (("VCEK", vcek), ("ASK", ask), ("ARK", ark)):
+            if not cert.not_valid_before_utc <= now <= cert.not_valid_after_utc:
+                raise ValueError(
+                    f"{name} is not valid at {now.isoformat()} "
+                    f"(valid {cert.not_valid_before_utc.isoformat()} to "
+                    f"{cert.not_valid_after_utc.isoformat()})"
+                )
+        self._check_signature("ARK", ark, ark)
+        self._check_signature("ASK", ask, ark)
+        self._check_signature("VCEK", vcek, ask)
+        return VerifiedChain(vcek=vcek, ask=ask, ark=ark)
+
+    def verify_pem_chain(
+        self,
+        vcek_pem: str | bytes,
+        chain_pem: str | bytes,
+        now: datetime.datetime | None = None,
+    ) -> VerifiedChain:
+        ask, ark = self.split_chain(chain_pem)
+        return self.verify_chain(self.load_pem(vcek_pem), ask, ark, now)
+
+    def verify_report(self, report: SNPReport, vcek: x509.Certificate) -> None:
+        key = (hashlib.sha256(report.raw).digest(), fingerprint(vcek))
+        if key not in self._reports:
+            self._reports[key] = _report_signature_error(report, vcek)
+        if self._reports[key] is not None:
+            raise ValueError(self._reports[key])
+
+    def _check_signature(
+        self, name: str, cert: x509.Certificate, issuer: x509.Certificate
+    ) -> None:
+        key = (fingerprint(cert), fingerprint(issuer))
+        if key not in self._signatures:
+            self._signatures[key] = _signature_error(cert, issuer)
+        if self._signatures[key] is not None:
+            raise ValueError(f"{name} {self._signatures[key]}")
+
+
+def _signature_error(cert: x509.Certificate, issuer: x509.Certificate) -> str | None:
+    if cert.issuer != issuer.subject:
+        return f"issuer {cert.issuer.rfc4514_string()} does not match {issuer.subject.rfc4514_string()}"
+    public_key = issuer.public_key()
+    try:
+        if isinstance(public_key, rsa.RSAPublicKey):
+            public_key.verify(
+                cert.signature,
+                cert.tbs_certificate_bytes,
+                cert.signature_algorithm_parameters,
+                cert.signature_hash_algorithm,
+            )
+        elif isinstance(public_key, ec.EllipticCurvePublicKey):
+            public_key.verify(
+                cert.signature,
+                cert.tbs_certificate_bytes,
+                ec.ECDSA(cert.signature_hash_algorithm),
+            )
+        else:
+            return f"has unsupported issuer key type {type(public_key).__name__}"
+    except InvalidSignature:
+        return "signature verification failed"
+    return None
+
+
+def _report_signature_error(report: SNPReport, vcek: x509.Certificate) -> str | None:
+    public_key = vcek.public_key()
+    if not isinstance(public_key, ec.EllipticCurvePublicKey):
+        return "VCEK does not carry an EC public key"
+    size = REPORT_SIGNATURE_COMPONENT_SIZE
+    sig = report.raw[REPORT_SIGNED_SIZE:]
+    r = int.from_bytes(sig[0:size], "little")
+    s = int.from_bytes(sig[size : 2 * size], "little")
+    try:
+        public_key.verify(
+            encode_dss_signature(r, s),
+            report.raw[:REPORT_SIGNED_SIZE],
+            ec.ECDSA(hashes.SHA384()),
+        )
+    except InvalidSignature:
+        return "report signature verification failed"
+    return None
+
+
+default_verifier = ChainVerifier()
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from histogram import Histogram
+from snp_guest import get_report
+
+
+def spawn_and_wait(cmd):
+    start = time.perf_counter()
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    return time.perf_counter() - start, result.returncode, len(result.stdout)
+
+
+def request_in_process(backend, bins):
+    start = time.perf_counter()
+    try:
+        report = get_report(backend=backend, bins=bins)
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return time.perf_counter() - start, 1, 0
+    return time.perf_counter() - start, 0, len(report)
+
+
+def run_level(cmd, concurrency, requests, duration, expect_output=True):
+    # cmd is either an argv list to spawn or a callable making one request
+    request = cmd if callable(cmd) else lambda: spawn_and_wait(cmd)
+    latency = Histogram()
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration if duration else None
+    issued = 0
+
+    def next_request():
+        nonlocal issued
+        with lock:
+            if requests is not None and issued >= requests:
+                return False
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+            issued += 1
+            return True
+
+    def worker():
+        nonlocal errors
+        while next_request():
+            seconds, returncode, out_len = request()
+            with lock:
+                latency.add(seconds)
+                if returncode != 0 or (expect_output and out_len == 0):
+                    errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(worker) for _ in range(concurrency)]
+        # Re-raise anything a worker hit rather than reporting a short run
+        for future in futures:
+            future.result()
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": latency.count,
+        "errors": errors,
+        "elapsed_seconds": elapsed,
+        "throughput_per_second": latency.count / elapsed if elapsed else 0.0,
+        "latency_seconds": latency.summary(),
+    }
+
+
+def format_level(name, level):
+    latency = level["latency_seconds"]
+    return (
+        f"{name:>8} c={level['concurrency']:<3} n={level['requests']:<6} "
+        f"err={level['errors']:<4} {level['throughput_per_second']:9.1f}/s "
+        f"p50={latency['p50'] * 1e3:8.3f}ms p90={latency['p90'] * 1e3:8.3f}ms "
+        f"p99={latency['p99'] * 1e3:8.3f}ms max={latency['max'] * 1e3:8.3f}ms"
+    )
+
+
+def main():
+    p = argparse.ArgumentParser(
+        description=(
+            "Benchmark SNP attestation report generation at increasing concurrency. "
+            "Each level is also run against a no-op binary to separate process spawn "
+            "overhead from the time spent in the guest device request."
+        )
+    )
+    p.add_argument(
+        "--bins",
+        type=str,
+        default="/tools",
+        help="Path to the directory containing the sidecar-tools binaries.",
+    )
+    p.add_argument(
+        "--fake",
+        action="store_true",
+        help="Use get-fake-snp-report (eg in CI, without an SNP guest device)",
+    )
+    p.add_argument(
+        "--concurrency",
+        type=str,
+        default="1,2,4,8",
+        help="Comma separated concurrency levels to run",
+    )
+    p.add_argument(
+        "--requests",
+        type=int,
+        default=200,
+        help="Report requests per concurrency level",
+    )
+    p.add_argument(
+        "--duration",
+        type=float,
+        default=None,
+        help="Seconds to run each level for instead of a fixed --requests count",
+    )
+    p.add_argument(
+        "--baseline-command",
+        type=str,
+        default=shutil.which("true") or "/bin/true",
+        help="No-op executable timed to estimate process spawn overhead",
+    )
+    p.add_argument(
+        "--in-process",
+        action="store_true",
+        help=(
+            "Also time requesting the report in-process through snp_guest "
+            "(configfs-tsm or /dev/sev-guest, the embedded template with --fake)"
+        ),
+    )
+    p.add_argument(
+        "--json",
+        type=str,
+        default=None,
+        help="Write the results to this JSON file",
+    )
+    args = p.parse_args()
+
+    try:
+        levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    except ValueError:
+        p.error("--concurrency must be a comma separated list of integers")
+    if not levels or any(c < 1 for c in levels):
+        p.error("--concurrency levels must be at least 1")
+    requests = None if args.duration else args.requests
+
+    report_cmd = [f"{args.bins}/{'get-fake-snp-report' if args.fake else 'get-snp-report'}"]
+    baseline_cmd = [args.baseline_command]
+
+    # Warm the page cache so the first level isn't charged for loading binaries
+    for cmd in (report_cmd, baseline_cmd):
+        _, returncode, _ = spawn_and_wait(cmd)
+        if returncode != 0:
+            print(f"{cmd[0]} exited with rc={returncode}", file=sys.stderr)
+            sys.exit(1)
+
+    results = []
+    for concurrency in levels:
+        baseline = run_level(
+            baseline_cmd, concurrency, requests, args.duration, expect_output=False
+        )
+        report = run_level(report_cmd, concurrency, requests, args.duration)
+        in_process = None
+        if args.in_process:
+            in_process = run_level(
+                lambda: request_in_process(
+                    "fake" if args.fake else "auto", args.bins
+                ),
+                concurrency,
+                requests,
+                args.duration,
+            )
+        spawn_p50 = baseline["latency_seconds"]["p50"]
+        device_p50 = max(0.0, report["latency_seconds"]["p50"] - spawn_p50)
+        results.append(
+            {
+                "concurrency": concurrency,
+                "report": report,
+                "spawn_baseline": baseline,
+                "estimated_spawn_overhead_p50_seconds": spawn_p50,
+                "estimated_device_p50_seconds": device_p50,
+            }
+        )
+        if in_process is not None:
+            results[-1]["in_process"] = in_process
+        print(format_level("spawn", baseline))
+        print(format_level("report", report))
+        if in_process is not None:
+            print(format_level("inproc", in_process))
+        print(
+            f"{'':>8} c={concurrency:<3} spawn~{spawn_p50 * 1e3:.3f}ms "
+            f"device~{device_p50 * 1e3:.3f}ms per request (p50)"
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(
+                {"command": report_cmd, "fake": args.fake, "levels": results},
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
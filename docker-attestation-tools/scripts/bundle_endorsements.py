@@ -0,0 +1,318 @@
+import argparse
+import base64
+import datetime
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sys
+
+from cryptography import x509
+
+from amd_chain import cert_to_pem, default_verifier, fingerprint
+from fetch_amd_collateral import make_host_amd_blob
+from snp_report import load_report
+
+
+BUNDLE_FORMAT_VERSION = 1
+# AMD VCEK extension carrying the chip ID the certificate was issued for
+VCEK_HWID_OID = x509.ObjectIdentifier("1.3.6.1.4.1.3704.1.4")
+
+
+def digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def endorsement_key(chip_id, tcbm):
+    return f"{chip_id}:{tcbm}"
+
+
+def parse_host_amd_blob(blob):
+    # Inverse of fetch_amd_collateral.make_host_amd_blob, accepting the b64 form too
+    blob = blob.strip()
+    if not blob.startswith("{"):
+        blob = base64.b64decode(blob).decode("utf-8")
+    fields = {}
+    rest = blob[1:-1]
+    while rest:
+        name, _, rest = rest.partition("=")
+        name = name.strip(" ,")
+        if rest.startswith('"'):
+            end = 1
+            while rest[end] != '"' or rest[end - 1] == "\\":
+                end += 1
+            value = rest[1:end].encode("utf-8").decode("unicode_escape")
+            rest = rest[end + 1 :]
+        else:
+            value, _, rest = rest.partition(",")
+        fields[name] = value.strip() if name == "tcbm" else value
+    return fields
+
+
+def vcek_hwid(vcek):
+    try:
+        value = vcek.extensions.get_extension_for_oid(VCEK_HWID_OID).value.value
+    except x509.ExtensionNotFound:
+        return None
+    # Some issuers wrap the chip ID in a DER OCTET STRING
+    if len(value) >= 2 and value[0] == 0x04 and value[1] == len(value) - 2:
+        value = value[2:]
+    return value.hex()
+
+
+def read_evidence(path):
+    # Accepts stash documents (one JSON file or a JSONL archive written with
+    # --append) and deploy-aci --collect-attestations archives
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as f:
+        text = f.read()
+    stripped = text.lstrip()
+    if stripped.startswith("{") and "\n{" not in stripped.rstrip():
+        lines = [stripped]
+    else:
+        lines = [line for line in text.splitlines() if line.strip()]
+    for lineno, line in enumerate(lines, start=1):
+        record = json.loads(line)
+        if "evidence" in record:
+            node = record.get("node")
+            doc = record["evidence"]
+        else:
+            doc = record
+            node = doc.get("hostname")
+        yield node or f"{os.path.basename(path)}:{lineno}", record, doc
+
+
+class EndorsementBundler:
+    def __init__(self, verify=True):
+        self.verify = verify
+        self.chains: dict[str, str] = {}
+        self.endorsements: dict[str, dict] = {}
+        self.nodes: list[dict] = []
+        self._collateral: list[tuple[str | None, str, str, str]] = []
+        self._node_names: set[str] = set()
+
+    def add_chain(self, chain):
+        chain_id = digest(chain)
+        self.chains.setdefault(chain_id, chain)
+        return chain_id
+
+    def add_collateral(self, tcbm, vcek_pem, chain):
+        vcek = default_verifier.load_pem(vcek_pem)
+        self._collateral.append((vcek_hwid(vcek), tcbm.upper(), vcek_pem, chain))
+
+    def find_collateral(self, chip_id, tcbm):
+        for hwid, collateral_tcbm, vcek, chain in self._collateral:
+            # Turin VCEKs are issued for a shortened hwid, so match on prefix
+            if hwid and chip_id.startswith(hwid) and collateral_tcbm == tcbm:
+                return vcek, chain
+        return None
+
+    def add_endorsement(self, chip_id, tcbm, vcek_pem, chain):
+        key = endorsement_key(chip_id, tcbm)
+        if key in self.endorsements:
+            return key
+        chain_id = self.add_chain(chain)
+        vcek = default_verifier.load_pem(vcek_pem)
+        if self.verify:
+            ask, ark = default_verifier.split_chain(chain)
+            default_verifier.verify_chain(vcek, ask, ark)
+        self.endorsements[key] = {
+            "chip_id": chip_id,
+            "tcbm": tcbm,
+            "vcek": cert_to_pem(vcek),
+            "vcek_fingerprint": fingerprint(vcek),
+            "chain": chain_id,
+        }
+        return key
+
+    def add_node(self, name, doc, extra=None):
+        if name in self._node_names:
+            raise ValueError(f"duplicate node {name}")
+        report = load_report(doc["report"].encode("utf-8"))
+        tcbm = (doc.get("tcbm") or report.reported_tcb).upper()
+        if doc.get("vcek") and doc.get("chain"):
+            vcek_pem, chain = doc["vcek"], doc["chain"]
+        else:
+            found = self.find_collateral(report.chip_id, tcbm)
+            if found is None:
+                raise ValueError(
+                    f"no endorsements for {name} (chip_id={report.chip_id} tcbm={tcbm})"
+                )
+            vcek_pem, chain = found
+        key = self.add_endorsement(report.chip_id, tcbm, vcek_pem, chain)
+        if self.verify:
+            vcek = default_verifier.load_pem(self.endorsements[key]["vcek"])
+            default_verifier.verify_report(report, vcek)
+        node = {"node": name, "endorsement": key, "report": report.raw.hex()}
+        if extra:
+            node.update(extra)
+        self._node_names.add(name)
+        self.nodes.append(node)
+
+    def to_dict(self):
+        return {
+            "version": BUNDLE_FORMAT_VERSION,
+            "created": datetime.datetime.now(datetime.UTC).isoformat(),
+            "verified": self.verify,
+            "chains": self.chains,
+            "endorsements": self.endorsements,
+            "nodes": self.nodes,
+        }
+
+
+def load_bundle(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as f:
+        bundle = json.load(f)
+    if bundle.get("version") != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"unsupported bundle version {bundle.get('version')}")
+    return bundle
+
+
+def write_bundle(path, bundle):
+    text = json.dumps(bundle, separators=(",", ":"))
+    if path == "-":
+        sys.stdout.write(text + "\n")
+        return
+    tmp = f"{path}.tmp"
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(tmp, "wt") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def node_evidence(bundle, node):
+    # Rebuilds what a single node would have handed to CCF on its own
+    endorsement = bundle["endorsements"][node["endorsement"]]
+    chain = bundle["chains"][endorsement["chain"]]
+    blob = make_host_amd_blob(
+        tcbm=endorsement["tcbm"], leaf=endorsement["vcek"], chain=chain
+    )
+    return {
+        "report": node["report"],
+        "host_amd_blob": base64.b64encode(blob.encode("utf-8")).decode("utf-8"),
+    }
+
+
+def expand_bundle(bundle, directory):
+    os.makedirs(directory, exist_ok=True)
+    for node in bundle["nodes"]:
+        evidence = node_evidence(bundle, node)
+        with open(os.path.join(directory, f"{node['node']}.report"), "w") as f:
+            f.write(evidence["report"] + "\n")
+        with open(os.path.join(directory, f"{node['node']}.host-amd-blob.b64"), "w") as f:
+            f.write(evidence["host_amd_blob"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Bundle attestation reports and AMD endorsements from many nodes into one "
+            "archive for CCF join requests. Nodes sharing a chip ID and TCB share one "
+            "endorsement entry, and each distinct cert chain is stored once."
+        )
+    )
+    parser.add_argument(
+        "evidence",
+        nargs="*",
+        help=(
+            "stash_attestation_and_endorsements.py JSON documents or JSONL archives, "
+            "or deploy-aci --collect-attestations archives (optionally .gz)"
+        ),
+    )
+    parser.add_argument(
+        "--collateral",
+        type=str,
+        action="append",
+        default=[],
+        help=(
+            "fetch_amd_collateral.py output (json or b64) to use for nodes whose "
+            "evidence carries no VCEK. Matched on the VCEK hwid and TCB. Repeatable."
+        ),
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="-",
+        help="Bundle file to write, gzip compressed if it ends in .gz. Defaults to stdout.",
+    )
+    parser.add_argument(
+        "--merge",
+        type=str,
+        action="append",
+        default=[],
+        help="Existing bundle to extend with the new evidence. Repeatable.",
+    )
+    parser.add_argument(
+        "--expand",
+        type=str,
+        default=None,
+        help=(
+            "Instead of bundling, write <node>.report and <node>.host-amd-blob.b64 "
+            "into this directory for every node of the --merge bundle(s)."
+        ),
+    )
+    parser.add_argument(
+        "--skip-verify",
+        action="store_true",
+        help="Do not verify VCEKs against the AMD chain or reports against VCEKs.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        stream=sys.stderr,
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+
+    if args.expand is not None and args.evidence:
+        parser.error("--expand takes bundles from --merge, not evidence files")
+    if not args.evidence and not args.merge:
+        parser.error("no evidence or bundles given")
+
+    bundler = EndorsementBundler(verify=not args.skip_verify)
+    for path in args.merge:
+        bundle = load_bundle(path)
+        for node in bundle["nodes"]:
+            endorsement = bundle["endorsements"][node["endorsement"]]
+            doc = {
+                "report": node["report"],
+                "tcbm": endorsement["tcbm"],
+                "vcek": endorsement["vcek"],
+                "chain": bundle["chains"][endorsement["chain"]],
+            }
+            extra = {k: v for k, v in node.items() if k not in ("node", "endorsement", "report")}
+            bundler.add_node(node["node"], doc, extra)
+
+    if args.expand is not None:
+        expand_bundle(bundler.to_dict(), args.expand)
+        logging.info(f"Wrote evidence for {len(bundler.nodes)} nodes to {args.expand}")
+        sys.exit(0)
+
+    for path in args.collateral:
+        with open(path, "r") as f:
+            fields = parse_host_amd_blob(f.read())
+        bundler.add_collateral(fields["tcbm"], fields["leaf"], fields["chain"])
+
+    failures = 0
+    for path in args.evidence:
+        for name, record, doc in read_evidence(path):
+            extra = {
+                k: record[k] for k in ("private_ip", "public_ip") if k in record
+            }
+            try:
+                bundler.add_node(name, doc, extra)
+            except (KeyError, ValueError) as e:
+                failures += 1
+                logging.error(f"Skipping {name}: {e}")
+
+    bundle = bundler.to_dict()
+    write_bundle(args.output, bundle)
+    logging.info(
+        f"Bundled {len(bundle['nodes'])} nodes with {len(bundle['endorsements'])} "
+        f"endorsements and {len(bundle['chains'])} chains"
+    )
+    if failures:
+        logging.error(f"{failures} nodes could not be bundled")
+        sys.exit(1)
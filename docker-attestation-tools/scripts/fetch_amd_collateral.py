@@ -4,9 +4,9 @@ import logging
 import sys
 import httpx
 import base64
-from cryptography import x509
-from cryptography.hazmat.primitives import serialization
-from cryptography.hazmat.backends import default_backend
+
+from amd_chain import cert_to_pem, default_verifier
+from snp_report import load_report
 
 
 class AMDCPUFamily(Enum):
@@ -60,6 +60,26 @@ def make_chain_url(base_url, product_family):
     return f"{base_url}/vcek/v1/{product_family}/cert_chain"
 
 
+def product_family_from_cpuid(family_id, model_id):
+    # See the AMD PPRs: Zen 3 (Milan) and Zen 4 (Genoa) are both family 19h,
+    # split by model number; Zen 5 (Turin) is family 1Ah.
+    if family_id == 0x19:
+        if model_id <= 0x0F:
+            return AMDCPUFamily.Milan.value
+        if 0x10 <= model_id <= 0x1F or 0xA0 <= model_id <= 0xAF:
+            return AMDCPUFamily.Genoa.value
+    elif family_id == 0x1A:
+        return AMDCPUFamily.Turin.value
+    return None
+
+
+def read_report_input(path):
+    if path == "-":
+        return load_report(sys.stdin.buffer.read())
+    with open(path, "rb") as f:
+        return load_report(f.read())
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Fetch AMD collateral data.")
     parser.add_argument(
@@ -79,12 +99,31 @@ if __name__ == "__main__":
         type=str,
         help="TCB (hex 64 bits eg DB18000000000004 from attestation).",
     )
+    parser.add_argument(
+        "--report",
+        type=str,
+        default=None,
+        help=(
+            "SNP attestation report (raw binary or hex, eg from get-snp-report) to "
+            "derive --chip-id and --tcb from. Use - to read from stdin."
+        ),
+    )
+    parser.add_argument(
+        "--report-tcb",
+        type=str,
+        choices=["reported", "committed"],
+        default="reported",
+        help="Which TCB from --report to request the leaf cert for.",
+    )
     parser.add_argument(
         "--product-family",
         type=str,
-        default="Milan",
+        default=None,
         choices=[pf.value for pf in AMDCPUFamily],
-        help="AMD product family",
+        help=(
+            "AMD product family. Inferred from --report when it carries CPUID "
+            "information, otherwise defaults to Milan."
+        ),
     )
     parser.add_argument(
         "--output",
@@ -99,6 +138,11 @@ if __name__ == "__main__":
         default="b64",
         help="Output format for the AMD host certs.",
     )
+    parser.add_argument(
+        "--skip-verify",
+        action="store_true",
+        help="Do not verify the fetched VCEK against the AMD cert chain.",
+    )
 
     args = parser.parse_args()
 
@@ -109,6 +153,31 @@ if __name__ == "__main__":
         format="%(asctime)s - %(levelname)s - %(message)s",
     )
 
+    if args.report is not None:
+        if args.chip_id is not None or args.tcb is not None:
+            parser.error("--report cannot be combined with --chip-id or --tcb")
+        try:
+            report = read_report_input(args.report)
+        except ValueError as e:
+            parser.error(f"--report {e}")
+        args.chip_id = report.chip_id
+        args.tcb = (
+            report.reported_tcb
+            if args.report_tcb == "reported"
+            else report.committed_tcb
+        )
+        if args.product_family is None and report.cpuid is not None:
+            args.product_family = product_family_from_cpuid(*report.cpuid)
+        logging.info(
+            f"Derived chip_id={args.chip_id} tcb={args.tcb} ({args.report_tcb}) "
+            f"from report version {report.version}"
+        )
+    elif args.chip_id is None or args.tcb is None:
+        parser.error("--chip-id and --tcb are required unless --report is set")
+
+    if args.product_family is None:
+        args.product_family = AMDCPUFamily.Milan.value
+
     leaf_url = make_leaf_url(
         args.base_url,
         args.product_family,
@@ -122,12 +191,8 @@ if __name__ == "__main__":
             leaf_url,
         )
         leaf_response.raise_for_status()
-        der = leaf_response.content
-        leaf = (
-            x509.load_der_x509_certificate(der, default_backend())
-            .public_bytes(serialization.Encoding.PEM)
-            .decode("utf-8")
-        )
+        leaf_cert = default_verifier.load_der(leaf_response.content)
+        leaf = cert_to_pem(leaf_cert)
         logging.info(f"AMD leaf cert response: {leaf}")
 
     chain_url = make_chain_url(args.base_url, args.product_family)
@@ -139,6 +204,28 @@ if __name__ == "__main__":
         chain = chain_response.text
         logging.info(f"AMD chain cert response: {chain_response.text}")
 
+    if not args.skip_verify:
+        try:
+            ask, ark = default_verifier.split_chain(chain)
+            verified = default_verifier.verify_chain(leaf_cert, ask, ark)
+            logging.info(f"Verified AMD cert chain: {verified.fingerprints}")
+            # The report is signed by the VCEK for its reported TCB only
+            reported = args.report is not None and (
+                args.tcb.upper() == report.reported_tcb.upper()
+            )
+            if reported:
+                default_verifier.verify_report(report, leaf_cert)
+                logging.info("Verified report signature against VCEK")
+            elif args.report is not None:
+                logging.info(
+                    f"Skipped report signature check: the VCEK is for the "
+                    f"{args.report_tcb} TCB, the report is signed for "
+                    f"{report.reported_tcb}"
+                )
+        except ValueError as e:
+            logging.error(f"Verification failed: {e}")
+            sys.exit(1)
+
     blob = make_host_amd_blob(
         tcbm=args.tcb,
         leaf=leaf,
@@ -0,0 +1,43 @@
+import collections
+import math
+
+
+class Histogram:
+    # Log-bucketed so memory stays bounded however long the run goes; each
+    # bucket spans ~1% so reported percentiles are within 1% of the true value.
+    GROWTH = 1.01
+    MIN_VALUE = 1e-6
+
+    def __init__(self):
+        self.buckets = collections.Counter()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        value = max(value, self.MIN_VALUE)
+        self.buckets[math.floor(math.log(value / self.MIN_VALUE, self.GROWTH))] += 1
+
+    def percentile(self, pct):
+        if self.count == 0:
+            return 0.0
+        rank = math.ceil(pct / 100 * self.count)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.max, self.MIN_VALUE * self.GROWTH ** (bucket + 1))
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
@@ -1,25 +1,814 @@
 #!/usr/bin/env python3
 import argparse
+import collections
+import csv
+import gzip
+import hashlib
+import json
+import math
+import signal
 import subprocess
+import threading
 import time
 import datetime
+import os
 import pathlib
+import re
 import shlex
+import shutil
 import sys
+import tempfile
 
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
-def log_failure(log_dir, workspace, iteration, returnobj):
+from histogram import Histogram
+
+WORKSPACE_PLACEHOLDER = "{workspace}"
+COPY_CHUNK_SIZE = 1 << 20
+HANG_DIAGNOSTIC_TIMEOUT = 60
+
+
+def open_output_log(path, compress):
+    if compress == "gzip":
+        return gzip.open(path.with_name(path.name + ".gz"), "wb", compresslevel=6)
+    if compress == "zstd":
+        f = open(path.with_name(path.name + ".zst"), "wb")
+        return zstandard.ZstdCompressor(threads=-1).stream_writer(f, closefd=True)
+    return open(path, "wb")
+
+
+def copy_output(output, dst, compress="none", max_bytes=None):
+    # output is the spooled file the child wrote to; keep at most the last
+    # max_bytes of it, streamed in chunks so memory stays flat.
+    size = output.seek(0, os.SEEK_END)
+    start = max(0, size - max_bytes) if max_bytes else 0
+    output.seek(start)
+    with open_output_log(dst, compress) as f:
+        if start:
+            f.write(f"[log_failures: truncated {start} leading bytes]\n".encode())
+        shutil.copyfileobj(output, f, COPY_CHUNK_SIZE)
+
+
+def log_failure(
+    log_dir, workspace, iteration, output, worker=None, compress="none", max_bytes=None
+):
     ts = datetime.datetime.now(datetime.UTC).strftime("%Y%m%dT%H%M%S.%fZ")
-    fail_dir = log_dir / f"fail_{iteration}_ts{ts}"
+    worker_tag = f"w{worker}_" if worker is not None else ""
+    fail_dir = log_dir / f"fail_{worker_tag}{iteration}_ts{ts}"
     fail_dir.mkdir(parents=True, exist_ok=False)
-    if returnobj is not None:
-        with open(fail_dir / "out", "w") as f:
-            f.write(returnobj.stdout)
+    if output is not None:
+        copy_output(output, fail_dir / "out", compress, max_bytes)
     if workspace.exists():
         workspace.rename(fail_dir / "workspace")
     return fail_dir
 
 
+# Rewrites applied to output lines before hashing so that run-specific noise
+# (addresses, pids, timestamps, temp paths) doesn't split one failure class.
+NORMALIZE_PATTERNS = [
+    (re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"), "<uuid>"),
+    (re.compile(r"\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(\.\d+)?Z?"), "<ts>"),
+    (re.compile(r"0x[0-9a-fA-F]+"), "<hex>"),
+    (re.compile(r"/tmp/[^\s:'\"]+"), "<tmp>"),
+    (re.compile(r"\d+(\.\d+)?"), "<n>"),
+]
+STACK_FRAME_PATTERNS = [
+    # gdb / sanitizer: "#3 0x5555 in ccf::foo(int) /src/foo.cpp:12"
+    re.compile(r"^\s*#\d+\s+(?:0x[0-9a-fA-F]+\s+in\s+)?([^\s(]+)"),
+    # python: 'File "x.py", line 12, in foo'
+    re.compile(r'^\s*File "([^"]+)", line \d+, in (\S+)'),
+]
+MAX_STACK_FRAMES = 8
+
+
+def normalize_line(line):
+    for pattern, replacement in NORMALIZE_PATTERNS:
+        line = pattern.sub(replacement, line)
+    return line.strip()
+
+
+def stack_frames(lines):
+    frames = []
+    for line in lines:
+        for pattern in STACK_FRAME_PATTERNS:
+            m = pattern.match(line)
+            if m:
+                frames.append(":".join(m.groups()))
+                break
+        if len(frames) >= MAX_STACK_FRAMES:
+            break
+    return frames
+
+
+def output_tail_lines(output, window_bytes):
+    size = output.seek(0, os.SEEK_END)
+    output.seek(max(0, size - window_bytes))
+    return output.read().decode("utf-8", errors="replace").splitlines()
+
+
+def failure_signature(outcome, output, tail_lines, window_bytes, exception=None):
+    if output is not None:
+        lines = output_tail_lines(output, window_bytes)
+    else:
+        lines = [repr(exception)]
+    tail = [n for n in (normalize_line(line) for line in lines) if n][-tail_lines:]
+    frames = stack_frames(lines)
+    digest = hashlib.sha256(
+        json.dumps([outcome, frames, tail]).encode("utf-8")
+    ).hexdigest()[:16]
+    return {"id": digest, "outcome": outcome, "frames": frames, "tail": tail}
+
+
+class FailureIndex:
+    def __init__(self, log_dir, keep_per_signature):
+        self.path = log_dir / "failure_index.json"
+        self.keep_per_signature = keep_per_signature
+        self.lock = threading.Lock()
+        self.signatures = {}
+        if self.path.exists():
+            # Earlier runs in this log directory keep their entries and logs,
+            # but count and kept start over so this run gets its own samples
+            with open(self.path) as f:
+                self.signatures = json.load(f)
+            for entry in self.signatures.values():
+                entry["count"] = 0
+                entry["kept"] = 0
+
+    def observe(self, signature, iteration, worker):
+        now = datetime.datetime.now(datetime.UTC).isoformat()
+        with self.lock:
+            entry = self.signatures.setdefault(
+                signature["id"],
+                {
+                    "outcome": signature["outcome"],
+                    "count": 0,
+                    "first_seen": now,
+                    "frames": signature["frames"],
+                    "tail": signature["tail"],
+                    "kept": 0,
+                    "logs": [],
+                },
+            )
+            entry["count"] += 1
+            entry["last_seen"] = now
+            entry["last_iteration"] = {"worker": worker, "iteration": iteration}
+            # Reserve the artifact slot here so concurrent workers can't overshoot K
+            keep = (
+                self.keep_per_signature == 0
+                or entry["kept"] < self.keep_per_signature
+            )
+            if keep:
+                entry["kept"] += 1
+            self.save()
+            return entry["count"], keep
+
+    def add_log(self, signature_id, fail_dir):
+        with self.lock:
+            self.signatures[signature_id]["logs"].append(fail_dir.name)
+            self.save()
+
+    def save(self):
+        ordered = dict(
+            sorted(self.signatures.items(), key=lambda item: -item[1]["count"])
+        )
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(ordered, f, indent=2)
+        tmp.replace(self.path)
+
+    def format_summary(self):
+        seen = {
+            sig_id: entry
+            for sig_id, entry in self.signatures.items()
+            if entry["count"]
+        }
+        lines = [f"Distinct failure signatures: {len(seen)}"]
+        for sig_id, entry in sorted(seen.items(), key=lambda item: -item[1]["count"]):
+            last = entry["tail"][-1] if entry["tail"] else ""
+            lines.append(f"  {sig_id} x{entry['count']} {entry['outcome']}: {last[:100]}")
+        return "\n".join(lines)
+
+
+def outcome_label(returncode):
+    if returncode is None:
+        return "EXCEPTION"
+    if returncode < 0:
+        try:
+            return signal.Signals(-returncode).name
+        except ValueError:
+            return f"signal {-returncode}"
+    return f"rc={returncode}"
+
+
+def wilson_interval(failures, total, z=1.96):
+    if total == 0:
+        return (0.0, 1.0)
+    p = failures / total
+    denom = 1 + z * z / total
+    centre = (p + z * z / (2 * total)) / denom
+    half = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denom
+    return (max(0.0, centre - half), min(1.0, centre + half))
+
+
+RESOURCE_FIELDS = [
+    "user_cpu_s",
+    "sys_cpu_s",
+    "max_rss_kb",
+    "block_in",
+    "block_out",
+    "voluntary_ctx_switches",
+    "involuntary_ctx_switches",
+]
+TIMESERIES_FIELDS = [
+    "timestamp",
+    "worker",
+    "iteration",
+    "seconds",
+    "outcome",
+    "failed",
+] + RESOURCE_FIELDS
+
+
+def resource_usage(rusage):
+    return {
+        "user_cpu_s": rusage.ru_utime,
+        "sys_cpu_s": rusage.ru_stime,
+        "max_rss_kb": rusage.ru_maxrss,
+        "block_in": rusage.ru_inblock,
+        "block_out": rusage.ru_oublock,
+        "voluntary_ctx_switches": rusage.ru_nvcsw,
+        "involuntary_ctx_switches": rusage.ru_nivcsw,
+    }
+
+
+def process_group_pids(pgid):
+    pids = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # pgrp is the third field after the parenthesised (and possibly spaced) comm
+        fields = stat.rsplit(")", 1)[1].split()
+        if int(fields[2]) == pgid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def read_proc_file(pid, name):
+    try:
+        with open(f"/proc/{pid}/{name}", "rb") as f:
+            return f.read().replace(b"\0", b" ").decode("utf-8", errors="replace").strip()
+    except OSError as e:
+        return f"<unavailable: {e.strerror}>"
+
+
+def run_diagnostic(cmd):
+    try:
+        result = subprocess.run(
+            cmd, capture_output=True, text=True, timeout=HANG_DIAGNOSTIC_TIMEOUT
+        )
+        return result.stdout + result.stderr
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return f"<{cmd[0]} failed: {e}>"
+
+
+def capture_hang_diagnostics(pgid, debugger):
+    sections = []
+    for pid in process_group_pids(pgid):
+        cmdline = read_proc_file(pid, "cmdline")
+        lines = [
+            f"--- pid {pid}: {cmdline}",
+            f"wchan: {read_proc_file(pid, 'wchan')}",
+            "kernel stack:",
+            read_proc_file(pid, "stack"),
+        ]
+        use_py_spy = debugger == "py-spy" or (
+            debugger == "auto" and "python" in cmdline and shutil.which("py-spy")
+        )
+        if use_py_spy:
+            lines.append(run_diagnostic(["py-spy", "dump", "--pid", str(pid)]))
+        elif debugger in ("auto", "gdb") and shutil.which("gdb"):
+            lines.append(
+                run_diagnostic(
+                    ["gdb", "-p", str(pid), "-batch", "-ex", "thread apply all bt"]
+                )
+            )
+        sections.append("\n".join(lines))
+    return "\n".join(sections)
+
+
+def kill_group(pgid):
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def run_child(
+    cmd, output, env, timeout=None, debugger="auto", cwd=None, on_spawn=None
+):
+    # wait4 rather than Popen.wait so the child's own rusage is available. The
+    # child leads its own process group, so a watchdog can dump stacks for and
+    # then kill everything it spawned. That also keeps the terminal's Ctrl-C
+    # from reaching it, so on_spawn(pid) lets the caller track the group.
+    proc = subprocess.Popen(
+        cmd,
+        stdout=output,
+        stderr=subprocess.STDOUT,
+        env=env,
+        cwd=cwd,
+        start_new_session=True,
+    )
+    if on_spawn is not None:
+        on_spawn(proc.pid)
+    hang = {}
+
+    def on_timeout():
+        hang["diagnostics"] = capture_hang_diagnostics(proc.pid, debugger)
+        kill_group(proc.pid)
+
+    timer = threading.Timer(timeout, on_timeout) if timeout is not None else None
+    if timer is not None:
+        timer.start()
+    try:
+        _, status, rusage = os.wait4(proc.pid, 0)
+    except BaseException:
+        kill_group(proc.pid)
+        os.wait4(proc.pid, 0)
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+            timer.join()
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return proc.returncode, resource_usage(rusage), hang.get("diagnostics")
+
+
+class IterationStats:
+    def __init__(self, timeseries_path=None):
+        self.latency = Histogram()
+        self.resources = {name: Histogram() for name in RESOURCE_FIELDS}
+        self.outcomes = collections.Counter()
+        self.iterations = 0
+        self.failures = 0
+        self.started = time.time()
+        self.timeseries = None
+        self.timeseries_writer = None
+        if timeseries_path is not None:
+            self.timeseries = open(timeseries_path, "w", newline="")
+            if timeseries_path.suffix == ".csv":
+                self.timeseries_writer = csv.writer(self.timeseries)
+                self.timeseries_writer.writerow(TIMESERIES_FIELDS)
+
+    def add(self, worker, iteration, seconds, outcome, failed, usage=None):
+        self.iterations += 1
+        self.failures += int(failed)
+        self.outcomes[outcome] += 1
+        self.latency.add(seconds)
+        for name, value in (usage or {}).items():
+            self.resources[name].add(value)
+        if self.timeseries is None:
+            return
+        row = [time.time(), worker, iteration, round(seconds, 6), outcome, failed] + [
+            (usage or {}).get(name) for name in RESOURCE_FIELDS
+        ]
+        if self.timeseries_writer is not None:
+            self.timeseries_writer.writerow(row)
+        else:
+            self.timeseries.write(json.dumps(dict(zip(TIMESERIES_FIELDS, row))) + "\n")
+
+    def summary(self):
+        low, high = wilson_interval(self.failures, self.iterations)
+        return {
+            "iterations": self.iterations,
+            "failures": self.failures,
+            "failure_rate": self.failures / self.iterations if self.iterations else 0.0,
+            "failure_rate_95ci": [low, high],
+            "elapsed_seconds": time.time() - self.started,
+            "latency_seconds": self.latency.summary(),
+            "resources": {
+                name: histogram.summary()
+                for name, histogram in self.resources.items()
+            },
+            "outcomes": dict(self.outcomes.most_common()),
+        }
+
+    def format_summary(self):
+        summary = self.summary()
+        latency = summary["latency_seconds"]
+        rss = summary["resources"]["max_rss_kb"]
+        cpu = summary["resources"]["user_cpu_s"]
+        low, high = summary["failure_rate_95ci"]
+        outcomes = " ".join(f"{k}:{v}" for k, v in summary["outcomes"].items())
+        return (
+            f"[STATS] iters={summary['iterations']} "
+            f"fail={summary['failures']} ({summary['failure_rate']:.4%}, 95% CI {low:.4%}-{high:.4%}) "
+            f"p50={latency['p50']:.3f}s p90={latency['p90']:.3f}s "
+            f"p99={latency['p99']:.3f}s max={latency['max']:.3f}s "
+            f"user_cpu_p50={cpu['p50']:.3f}s "
+            f"rss_p50={rss['p50'] / 1024:.1f}MB rss_max={rss['max'] / 1024:.1f}MB "
+            f"outcomes[{outcomes}]"
+        )
+
+    def anomaly(self, usage, rss_ratio, cpu_ratio, warmup):
+        # Compare against the median of earlier iterations once enough are in
+        if self.iterations < warmup:
+            return None
+        checks = [
+            ("rss", "max_rss_kb", rss_ratio, usage["max_rss_kb"]),
+            ("cpu", "user_cpu_s", cpu_ratio, usage["user_cpu_s"] + usage["sys_cpu_s"]),
+        ]
+        for label, name, ratio, value in checks:
+            if not ratio:
+                continue
+            baseline = self.resources[name].percentile(50)
+            if name == "user_cpu_s":
+                baseline += self.resources["sys_cpu_s"].percentile(50)
+            if baseline > 0 and value > ratio * baseline:
+                return (label, f"{value / baseline:.2f}x median")
+        return None
+
+    def close(self):
+        if self.timeseries is not None:
+            self.timeseries.close()
+
+
+def copy_workspace(src, dst, mode):
+    if dst.exists():
+        shutil.rmtree(dst)
+    if not src.exists():
+        dst.mkdir(parents=True)
+        return
+    if mode == "hardlink":
+        cmd = ["cp", "-al", str(src), str(dst)]
+    elif mode == "reflink":
+        # Falls back to a regular copy on filesystems without reflink support
+        cmd = ["cp", "-a", "--reflink=auto", str(src), str(dst)]
+    else:
+        shutil.copytree(src, dst, symlinks=True)
+        return
+    subprocess.run(cmd, check=True)
+
+
+class WorkspaceManager:
+    # Keeps a pristine spare copy of the template prepared in the background,
+    # so restoring the workspace between iterations is a pair of renames rather
+    # than a copy proportional to the workspace size. Dirty workspaces are
+    # renamed into a trash directory and deleted off the critical path too.
+    def __init__(self, template, workspace, mode, reset_each_iteration):
+        self.template = template
+        self.workspace = workspace
+        self.mode = mode
+        self.reset_each_iteration = reset_each_iteration
+        self.spare = workspace.with_name(f".{workspace.name}.spare")
+        self.trash = workspace.with_name(f".{workspace.name}.trash")
+        self.trash_seq = 0
+        self.pending = None
+        self.used = False
+
+    def start(self):
+        shutil.rmtree(self.spare, ignore_errors=True)
+        shutil.rmtree(self.trash, ignore_errors=True)
+        self.trash.mkdir(parents=True)
+        copy_workspace(self.template, self.workspace, self.mode)
+        self.prepare_spare()
+
+    def prepare_spare(self):
+        def prepare():
+            for entry in self.trash.iterdir():
+                shutil.rmtree(entry, ignore_errors=True)
+            copy_workspace(self.template, self.spare, self.mode)
+
+        self.pending = threading.Thread(target=prepare, daemon=True)
+        self.pending.start()
+
+    def before_iteration(self):
+        if self.used and (self.reset_each_iteration or not self.workspace.exists()):
+            self.restore()
+        self.used = True
+
+    def restore(self):
+        self.pending.join()
+        self.discard()
+        self.spare.rename(self.workspace)
+        self.prepare_spare()
+
+    def discard(self):
+        if self.workspace.exists():
+            self.trash_seq += 1
+            self.workspace.rename(self.trash / str(self.trash_seq))
+
+    def close(self, remove_workspace):
+        if self.pending is not None:
+            self.pending.join()
+        shutil.rmtree(self.spare, ignore_errors=True)
+        shutil.rmtree(self.trash, ignore_errors=True)
+        if remove_workspace:
+            shutil.rmtree(self.workspace, ignore_errors=True)
+
+
+def worker_command(cmd, workspace):
+    return [arg.replace(WORKSPACE_PLACEHOLDER, str(workspace)) for arg in cmd]
+
+
+class StressRun:
+    def __init__(self, args, cmd, log_dir, workspace, deadline):
+        self.args = args
+        self.cmd = cmd
+        self.log_dir = log_dir
+        self.workspace = workspace
+        self.deadline = deadline
+        self.lock = threading.Lock()
+        self.output_lock = threading.Lock()
+        self.stop = threading.Event()
+        self.interrupted = False
+        # worker -> process group of the child it is waiting on
+        self.children = {}
+        self.iterations = 0
+        self.failures = 0
+        self.worker_iterations = [0] * args.jobs
+        self.stats = IterationStats(
+            pathlib.Path(args.timeseries) if args.timeseries else None
+        )
+        self.next_stats_report = time.time() + args.stats_interval
+        self.failure_index = FailureIndex(log_dir, args.keep_per_signature)
+        self.recent_durations = collections.deque(maxlen=args.timeout_window)
+
+    def worker_workspace(self, worker):
+        if self.args.jobs == 1:
+            return self.workspace
+        return self.workspace.with_name(f"{self.workspace.name}.w{worker}")
+
+    def label(self, worker, iteration):
+        if self.args.jobs == 1:
+            return f"[ITER {iteration}]"
+        return f"[W{worker} ITER {iteration}]"
+
+    def log(self, message, file=None):
+        # Workers print concurrently; write whole lines so they never interleave
+        file = file or sys.stdout
+        with self.output_lock:
+            file.write(message + "\n")
+            file.flush()
+
+    def check_anomaly(self, usage):
+        with self.lock:
+            if self.args.max_rss_mb and usage["max_rss_kb"] > self.args.max_rss_mb * 1024:
+                return ("rss", f"{usage['max_rss_kb'] / 1024:.0f}MB > {self.args.max_rss_mb}MB")
+            return self.stats.anomaly(
+                usage,
+                self.args.rss_anomaly_ratio,
+                self.args.cpu_anomaly_ratio,
+                self.args.anomaly_warmup,
+            )
+
+    def iteration_timeout(self):
+        timeout = self.args.timeout
+        if not self.args.adaptive_timeout:
+            return timeout
+        with self.lock:
+            if len(self.recent_durations) < self.args.timeout_warmup:
+                return timeout
+            ordered = sorted(self.recent_durations)
+        p99 = ordered[min(len(ordered) - 1, math.ceil(0.99 * len(ordered)) - 1)]
+        adaptive = max(self.args.min_timeout, self.args.adaptive_timeout * p99)
+        return adaptive if timeout is None else min(timeout, adaptive)
+
+    def record(self, worker, failed, seconds, outcome, usage=None):
+        with self.lock:
+            if not failed:
+                self.recent_durations.append(seconds)
+            self.iterations += 1
+            self.worker_iterations[worker] += 1
+            if failed:
+                self.failures += 1
+                if self.args.stop_on_fail:
+                    self.stop.set()
+            self.stats.add(
+                worker, self.worker_iterations[worker], seconds, outcome, failed, usage
+            )
+            if self.args.stats_interval and time.time() >= self.next_stats_report:
+                self.next_stats_report = time.time() + self.args.stats_interval
+                self.log(self.stats.format_summary())
+            return self.worker_iterations[worker]
+
+    def workspace_manager(self, workspace):
+        if self.args.workspace_template:
+            template = pathlib.Path(self.args.workspace_template)
+        elif self.args.jobs > 1:
+            # Without an explicit template, workers are seeded from the shared workspace
+            template = self.workspace
+        else:
+            return None
+        return WorkspaceManager(
+            template,
+            workspace,
+            self.args.workspace_copy,
+            reset_each_iteration=bool(self.args.workspace_template),
+        )
+
+    def run_worker(self, worker):
+        workspace = self.worker_workspace(worker)
+        manager = self.workspace_manager(workspace)
+        if manager is not None:
+            manager.start()
+        cmd = worker_command(self.cmd, workspace)
+        env = os.environ | {
+            "LOG_FAILURES_WORKER": str(worker),
+            "LOG_FAILURES_WORKSPACE": str(workspace),
+        }
+
+        # The child writes straight into this file, so passing iterations cost
+        # no memory or decoding; it is only read back when an iteration fails.
+        output = tempfile.TemporaryFile(dir=self.log_dir, prefix=".out-")
+        try:
+            self.worker_loop(worker, workspace, manager, cmd, env, output)
+        finally:
+            output.close()
+            if manager is not None:
+                manager.close(remove_workspace=self.args.jobs > 1)
+
+    def worker_loop(self, worker, workspace, manager, cmd, env, output):
+        while time.time() < self.deadline and not self.stop.is_set():
+            if manager is not None:
+                manager.before_iteration()
+            start = time.time()
+            output.seek(0)
+            output.truncate()
+            timeout = self.iteration_timeout()
+            try:
+                cwd = None
+                if self.args.chdir_workspace:
+                    # A failure moves the workspace away; the next iteration
+                    # still needs somewhere to run
+                    workspace.mkdir(parents=True, exist_ok=True)
+                    cwd = workspace
+                returncode, usage, hang_diagnostics = run_child(
+                    cmd,
+                    output,
+                    env,
+                    timeout,
+                    self.args.hang_debugger,
+                    cwd,
+                    on_spawn=lambda pid: self.track_child(worker, pid),
+                )
+            except Exception as e:
+                iteration = self.record(worker, True, time.time() - start, "EXCEPTION")
+                log_path = self.log_failure(
+                    workspace, manager, iteration, None, worker, "EXCEPTION", exception=e
+                )
+                self.log(
+                    f"{self.label(worker, iteration)} EXCEPTION {e!r} -> logged to {log_path}",
+                    file=sys.stderr,
+                )
+                continue
+
+            finally:
+                with self.lock:
+                    self.children.pop(worker, None)
+            if self.interrupted:
+                # Killed by interrupt(), not a failure of the command
+                break
+
+            dur = time.time() - start
+            outcome = outcome_label(returncode)
+            failed = returncode != 0
+            signature = None
+            if hang_diagnostics is not None:
+                outcome = "HANG"
+                # From the child's own output: the stacks appended below hold
+                # pids and addresses that differ on every hang
+                signature = self.failure_signature(outcome, output)
+                output.seek(0, os.SEEK_END)
+                output.write(
+                    f"\n=== log_failures: killed after {timeout:.1f}s timeout ===\n".encode()
+                    + hang_diagnostics.encode("utf-8", errors="replace")
+                    + b"\n"
+                )
+                output.flush()
+            elif not failed:
+                anomaly = self.check_anomaly(usage)
+                if anomaly is not None:
+                    outcome = f"ANOMALY {anomaly[0]}"
+                    failed = True
+            cpu = usage["user_cpu_s"] + usage["sys_cpu_s"]
+            resources = f"cpu={cpu:.3f}s rss={usage['max_rss_kb'] / 1024:.1f}MB"
+            if failed and outcome.startswith("ANOMALY"):
+                resources += f", {anomaly[1]}"
+            iteration = self.record(worker, failed, dur, outcome, usage)
+            if failed:
+                log_path = self.log_failure(
+                    workspace, manager, iteration, output, worker, outcome, signature
+                )
+                self.log(
+                    f"{self.label(worker, iteration)} FAIL {outcome} "
+                    f"({dur:.3f}s, {resources}) -> {log_path}"
+                )
+            else:
+                self.log(
+                    f"{self.label(worker, iteration)} OK (rc=0, {dur:.3f}s, {resources})"
+                )
+
+            if self.stop.is_set():
+                break
+            if self.args.sleep:
+                remaining = self.deadline - time.time()
+                if remaining <= 0:
+                    break
+                time.sleep(min(self.args.sleep, max(0, remaining)))
+
+    def failure_signature(self, outcome, output, exception=None):
+        return failure_signature(
+            outcome,
+            output,
+            self.args.signature_lines,
+            self.args.signature_window_bytes,
+            exception,
+        )
+
+    def log_failure(
+        self,
+        workspace,
+        manager,
+        iteration,
+        output,
+        worker,
+        outcome,
+        signature=None,
+        exception=None,
+    ):
+        if signature is None:
+            signature = self.failure_signature(outcome, output, exception)
+        count, keep = self.failure_index.observe(signature, iteration, worker)
+        if not keep:
+            # Already have enough artifacts for this class; just count it
+            if manager is not None:
+                manager.discard()
+            elif workspace.exists():
+                shutil.rmtree(workspace)
+            return f"signature {signature['id']} (#{count}, artifacts not kept)"
+        fail_dir = log_failure(
+            self.log_dir,
+            workspace,
+            iteration,
+            output,
+            worker if self.args.jobs > 1 else None,
+            compress=self.args.compress_logs,
+            max_bytes=self.args.max_output_bytes,
+        )
+        self.failure_index.add_log(signature["id"], fail_dir)
+        return f"{fail_dir} (signature {signature['id']} #{count})"
+
+    def track_child(self, worker, pgid):
+        with self.lock:
+            self.children[worker] = pgid
+            interrupted = self.interrupted
+        if interrupted:
+            kill_group(pgid)
+
+    def interrupt(self):
+        # Children run in their own sessions, so Ctrl-C only reaches this
+        # process; kill their groups and let the workers clean up
+        with self.lock:
+            self.interrupted = True
+            self.stop.set()
+            groups = list(self.children.values())
+        for pgid in groups:
+            kill_group(pgid)
+
+    def run(self):
+        try:
+            self.run_workers()
+        finally:
+            self.stats.close()
+
+    def run_workers(self):
+        if self.args.jobs == 1:
+            self.run_worker(0)
+            return
+        threads = [
+            threading.Thread(target=self.run_worker, args=(worker,), daemon=True)
+            for worker in range(self.args.jobs)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            self.interrupt()
+            for thread in threads:
+                thread.join()
+            raise
+
+
 def main():
     p = argparse.ArgumentParser(
         description="Repeatedly run a command until duration elapses; on failure dump output to logs."
@@ -50,7 +839,167 @@ def main():
         "--workspace-dir",
         type=str,
         default="workspace",
-        help="Workspace directory, moved when a failure occcurs",
+        help=(
+            "Workspace directory, moved when a failure occcurs. With --jobs > 1 it is "
+            "copied per worker to <workspace-dir>.w<N>. {workspace} in the command and "
+            "$LOG_FAILURES_WORKSPACE give the worker's copy as an absolute path."
+        ),
+    )
+    p.add_argument(
+        "--chdir-workspace",
+        action="store_true",
+        help=(
+            "Run the command inside its workspace instead of the current directory. "
+            "A relative command path is resolved first; relative arguments then "
+            "refer to the workspace."
+        ),
+    )
+    p.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="Number of iterations to run concurrently",
+    )
+    p.add_argument(
+        "--workspace-template",
+        type=str,
+        default=None,
+        help=(
+            "Pristine workspace restored into --workspace-dir before every iteration. "
+            "The next copy is prepared in the background, so the restore itself is a rename."
+        ),
+    )
+    p.add_argument(
+        "--workspace-copy",
+        choices=["reflink", "hardlink", "copy"],
+        default="reflink",
+        help=(
+            "How to copy the workspace template (or, with --jobs > 1, the shared workspace). "
+            "reflink falls back to a full copy where unsupported; hardlink shares file "
+            "contents with the template, so the command must not modify files in place."
+        ),
+    )
+    p.add_argument(
+        "--max-output-bytes",
+        type=int,
+        default=None,
+        help="Keep only the last N bytes of a failing iteration's output (default: all)",
+    )
+    p.add_argument(
+        "--compress-logs",
+        choices=["none", "gzip", "zstd"],
+        default="none",
+        help="Compress failure output logs (zstd requires the zstandard module)",
+    )
+    p.add_argument(
+        "--keep-per-signature",
+        type=int,
+        default=3,
+        help=(
+            "Keep full failure artifacts for only the first K failures of each "
+            "signature; later ones are just counted (0 keeps everything)"
+        ),
+    )
+    p.add_argument(
+        "--signature-lines",
+        type=int,
+        default=20,
+        help="Number of trailing (normalized) output lines included in a failure signature",
+    )
+    p.add_argument(
+        "--signature-window-bytes",
+        type=int,
+        default=1 << 20,
+        help="Bytes from the end of a failing iteration's output scanned for its signature",
+    )
+    p.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help=(
+            "Per-iteration timeout in seconds. On expiry, stacks of the child's process "
+            "group are captured, the group is killed and the iteration logged as a HANG."
+        ),
+    )
+    p.add_argument(
+        "--adaptive-timeout",
+        type=float,
+        default=None,
+        metavar="K",
+        help=(
+            "Time out iterations running longer than K times the rolling p99 of recent "
+            "passing iterations (capped by --timeout, floored by --min-timeout)"
+        ),
+    )
+    p.add_argument(
+        "--min-timeout",
+        type=float,
+        default=10.0,
+        help="Lower bound for --adaptive-timeout in seconds",
+    )
+    p.add_argument(
+        "--timeout-warmup",
+        type=int,
+        default=20,
+        help="Passing iterations to observe before --adaptive-timeout applies",
+    )
+    p.add_argument(
+        "--timeout-window",
+        type=int,
+        default=200,
+        help="Number of recent passing iterations used for --adaptive-timeout",
+    )
+    p.add_argument(
+        "--hang-debugger",
+        choices=["auto", "gdb", "py-spy", "none"],
+        default="auto",
+        help=(
+            "Tool used to capture stacks of hung processes in addition to /proc; auto "
+            "uses py-spy for python processes and gdb otherwise, when installed"
+        ),
+    )
+    p.add_argument(
+        "--rss-anomaly-ratio",
+        type=float,
+        default=None,
+        help="Fail a passing iteration whose peak RSS exceeds this multiple of the median (eg 2)",
+    )
+    p.add_argument(
+        "--cpu-anomaly-ratio",
+        type=float,
+        default=None,
+        help="Fail a passing iteration whose user+sys CPU time exceeds this multiple of the median",
+    )
+    p.add_argument(
+        "--max-rss-mb",
+        type=float,
+        default=None,
+        help="Fail a passing iteration whose peak RSS exceeds this many MB",
+    )
+    p.add_argument(
+        "--anomaly-warmup",
+        type=int,
+        default=20,
+        help="Iterations to observe before the ratio anomaly checks apply",
+    )
+    p.add_argument(
+        "--stats-interval",
+        type=float,
+        default=60.0,
+        help="Seconds between live latency/failure-rate summaries (0 to disable)",
+    )
+    p.add_argument(
+        "--timeseries",
+        type=str,
+        default=None,
+        help="Write one row per iteration to this file (CSV if it ends in .csv, else JSON lines)",
+    )
+    p.add_argument(
+        "--summary-json",
+        type=str,
+        default=None,
+        help="Write the final statistics summary to this JSON file",
     )
     p.add_argument(
       "command",
@@ -62,59 +1011,65 @@ def main():
       help="Command to run (shell-style string or -- use --args ... form)",
     )
     args = p.parse_args()
+    if args.jobs < 1:
+        p.error("--jobs must be at least 1")
+    if args.max_output_bytes is not None and args.max_output_bytes < 1:
+        p.error("--max-output-bytes must be positive")
+    if args.workspace_template and not pathlib.Path(args.workspace_template).is_dir():
+        p.error("--workspace-template must be an existing directory")
+    if (
+        args.workspace_template
+        and pathlib.Path(args.workspace_template).resolve()
+        == pathlib.Path(args.workspace_dir).resolve()
+    ):
+        p.error("--workspace-template must differ from --workspace-dir")
+    if args.timeout is not None and args.timeout <= 0:
+        p.error("--timeout must be positive")
+    if args.adaptive_timeout is not None and args.adaptive_timeout <= 0:
+        p.error("--adaptive-timeout must be positive")
+    if args.timeout_window < 1:
+        p.error("--timeout-window must be at least 1")
+    if args.timeout_warmup < 1:
+        p.error("--timeout-warmup must be at least 1")
+    if args.keep_per_signature < 0:
+        p.error("--keep-per-signature must not be negative")
+    if args.compress_logs == "zstd" and zstandard is None:
+        p.error("--compress-logs zstd requires the zstandard module")
 
     log_dir = pathlib.Path(args.log_dir)
     log_dir.mkdir(parents=True, exist_ok=True)
 
-    workspace = pathlib.Path(args.workspace_dir)
+    # Absolute, so {workspace} still points at it from --chdir-workspace children
+    workspace = pathlib.Path(args.workspace_dir).absolute()
 
     deadline = time.time() + args.duration * 3600
-    iteration = 0
-    failures = 0
 
-    cmd = [args.command] + args.args_remainder if args.args_remainder else cmd
+    command = args.command
+    if args.chdir_workspace and os.sep in command and os.path.exists(command):
+        command = os.path.abspath(command)
+    cmd = [command] + args.args_remainder
 
-    print(f"Starting loop for up to {args.duration:.2f}hr: {' '.join(cmd)}")
-    while time.time() < deadline:
-        iteration += 1
-        start = time.time()
-        try:
-            cp = subprocess.run(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                check=False,
-            )
-        except Exception as e:
-            failures += 1
-            log_path = log_failure(log_dir, workspace, iteration, None)
-            print(
-                f"[ITER {iteration}] EXCEPTION -> logged to {log_path}", file=sys.stderr
-            )
-            if args.stop_on_fail:
-                break
-            continue
-
-        if cp.returncode != 0:
-            failures += 1
-            log_path = log_failure(log_dir, workspace, iteration, cp)
-            print(f"[ITER {iteration}] FAIL rc={cp.returncode} -> {log_path}")
-            if args.stop_on_fail:
-                break
-        else:
-            dur = time.time() - start
-            print(f"[ITER {iteration}] OK (rc=0, {dur:.3f}s)")
-
-        if args.sleep:
-            remaining = deadline - time.time()
-            if remaining <= 0:
-                break
-            time.sleep(min(args.sleep, max(0, remaining)))
+    print(
+        f"Starting loop for up to {args.duration:.2f}hr with {args.jobs} job(s): {' '.join(cmd)}"
+    )
+    stress = StressRun(args, cmd, log_dir, workspace, deadline)
+    interrupted = False
+    try:
+        stress.run()
+    except KeyboardInterrupt:
+        interrupted = True
+        print("Interrupted; stopped all workers")
 
-    print(f"Done. Iterations={iteration} Failures={failures}")
-    if failures:
-        print(f"Failure logs in: {log_dir}")
+    print(stress.stats.format_summary())
+    if args.summary_json:
+        with open(args.summary_json, "w") as f:
+            json.dump(stress.stats.summary(), f, indent=2)
+    print(f"Done. Iterations={stress.iterations} Failures={stress.failures}")
+    if stress.failures:
+        print(stress.failure_index.format_summary())
+        print(f"Failure logs in: {log_dir} (index: {stress.failure_index.path})")
+    if interrupted:
+        sys.exit(130)
 
 
 if __name__ == "__main__":
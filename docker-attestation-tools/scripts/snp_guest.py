@@ -0,0 +1,138 @@
+import ctypes
+import fcntl
+import os
+import struct
+import subprocess
+
+from snp_report import (
+    REPORT_DATA_OFFSET,
+    REPORT_DATA_SIZE,
+    SNP_REPORT_SIZE,
+)
+
+
+TSM_REPORT_DIR = "/sys/kernel/config/tsm/report"
+SEV_GUEST_DEVICE = "/dev/sev-guest"
+# _IOWR('S', 0x0, struct snp_guest_request_ioctl), see linux/sev-guest.h
+SNP_GET_REPORT = 0xC0205300
+SNP_MSG_VERSION = 1
+SNP_REPORT_RESP_SIZE = 4000
+SNP_REPORT_RESP_HEADER_SIZE = 0x20
+HOST_DATA_OFFSET = 0xC0
+HOST_DATA_SIZE = 32
+BACKENDS = ["auto", "tsm", "sev-guest", "binary", "fake"]
+# Output of bin/get-fake-snp-report with no arguments; report_data and
+# host_data are patched in the same way the binary does.
+FAKE_SNP_REPORT = "01000000010000001f000300000000000100000000000000000000000000000002000000000000000000000000000000000000000100000000000000000000280100000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000e29af700e85b39996fa38226d2804b78cad746ffef4477360a61b47874bdecd640f9d32f5ff64a55baad3c545484d9ed000000000000000000000000000000000000000000000000000000000000000098c475ca5f7683e8d351e7e789a1baff19041750567161ad52bf0d152bd76d7c6f313d0a0fd72d0089692c18f521155800000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000040aea62690b08eb6d680392c9a9b3db56a9b3cc44083b9da31fb88bcfc493407ffffffffffffffffffffffffffffffffffffffffffffffffffffffffffffffff0000000000000028000000000000000000000000000000000000000000000000e6c86796cd44b0bc6b7c0d4fdab33e2807e14b5fc4538b3750921169d97bcf4447c7d3ab2a7c25f74c1641e2885c1011d025cc536f5c9a2504713136c7877f480000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000003131c0f3e7be5c6e400f22404596e1874381e99d03de45ef8b97eee0a0fa93a4911550330343f14dddbbd6c0db83744f000000000000000000000000000000000000000000000000db07c83c5e6162c2387f3b76cd547672657f6a5df99df98efee7c15349320d83e086c5003ec43050a9b18d1c39dedc340000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000000"
+
+
+def pad_report_data(report_data: bytes) -> bytes:
+    if len(report_data) > REPORT_DATA_SIZE:
+        raise ValueError(
+            f"report_data must be at most {REPORT_DATA_SIZE} bytes, got {len(report_data)}"
+        )
+    return report_data.ljust(REPORT_DATA_SIZE, b"\0")
+
+
+def tsm_report(report_data: bytes, vmpl: int | None = None) -> bytes:
+    entry = os.path.join(TSM_REPORT_DIR, f"snp-{os.getpid()}-{os.urandom(4).hex()}")
+    os.mkdir(entry)
+    try:
+        if vmpl is not None:
+            with open(os.path.join(entry, "privlevel"), "w") as f:
+                f.write(str(vmpl))
+        with open(os.path.join(entry, "inblob"), "wb") as f:
+            f.write(pad_report_data(report_data))
+        with open(os.path.join(entry, "outblob"), "rb") as f:
+            return f.read()
+    finally:
+        os.rmdir(entry)
+
+
+def sev_guest_report(report_data: bytes, vmpl: int = 0) -> bytes:
+    # struct snp_report_req { u8 user_data[64]; u32 vmpl; u8 rsvd[28]; }
+    req = ctypes.create_string_buffer(
+        pad_report_data(report_data) + struct.pack("<I", vmpl) + bytes(28), 96
+    )
+    resp = ctypes.create_string_buffer(SNP_REPORT_RESP_SIZE)
+    request = bytearray(
+        struct.pack(
+            "<B7xQQQ",
+            SNP_MSG_VERSION,
+            ctypes.addressof(req),
+            ctypes.addressof(resp),
+            0,
+        )
+    )
+    fd = os.open(SEV_GUEST_DEVICE, os.O_RDWR)
+    try:
+        fcntl.ioctl(fd, SNP_GET_REPORT, request, True)
+    finally:
+        os.close(fd)
+    (exitinfo2,) = struct.unpack_from("<Q", request, 24)
+    if exitinfo2 != 0:
+        raise OSError(f"SNP_GET_REPORT failed with exitinfo2={exitinfo2:#x}")
+    status, size = struct.unpack_from("<II", resp.raw, 0)
+    if status != 0:
+        raise OSError(f"SNP_GET_REPORT returned status {status:#x}")
+    start = SNP_REPORT_RESP_HEADER_SIZE
+    return resp.raw[start : start + size]
+
+
+def binary_report(report_data: bytes, bins: str) -> bytes:
+    # Covers hosts only exposing the legacy /dev/sev interface
+    args = [report_data.hex()] if report_data else []
+    result = subprocess.run(
+        [f"{bins}/get-snp-report"] + args, capture_output=True, text=True, check=True
+    )
+    return bytes.fromhex(result.stdout.strip())
+
+
+def fake_report(report_data: bytes = b"", host_data: bytes = b"") -> bytes:
+    if len(host_data) > HOST_DATA_SIZE:
+        raise ValueError(
+            f"host_data must be at most {HOST_DATA_SIZE} bytes, got {len(host_data)}"
+        )
+    report = bytearray.fromhex(FAKE_SNP_REPORT)
+    report[REPORT_DATA_OFFSET : REPORT_DATA_OFFSET + REPORT_DATA_SIZE] = pad_report_data(
+        report_data
+    )
+    report[HOST_DATA_OFFSET : HOST_DATA_OFFSET + HOST_DATA_SIZE] = host_data.ljust(
+        HOST_DATA_SIZE, b"\0"
+    )
+    return bytes(report)
+
+
+def detect_backend(bins: str | None = None) -> str:
+    if os.path.isdir(TSM_REPORT_DIR):
+        return "tsm"
+    if os.path.exists(SEV_GUEST_DEVICE):
+        return "sev-guest"
+    if bins is not None and os.path.exists(f"{bins}/get-snp-report"):
+        return "binary"
+    raise OSError("No supported SNP device found")
+
+
+def get_report(
+    report_data: bytes = b"",
+    backend: str = "auto",
+    bins: str | None = None,
+    vmpl: int = 0,
+) -> bytes:
+    if backend == "auto":
+        backend = detect_backend(bins)
+    if backend == "tsm":
+        report = tsm_report(report_data, vmpl)
+    elif backend == "sev-guest":
+        report = sev_guest_report(report_data, vmpl)
+    elif backend == "binary":
+        if bins is None:
+            raise ValueError("the binary backend requires bins")
+        report = binary_report(report_data, bins)
+    elif backend == "fake":
+        report = fake_report(report_data)
+    else:
+        raise ValueError(f"Unknown SNP report backend {backend}")
+    if len(report) < SNP_REPORT_SIZE:
+        raise OSError(f"SNP report too short: {len(report)} bytes")
+    return report[:SNP_REPORT_SIZE]
@@ -0,0 +1,96 @@
+import string
+from dataclasses import dataclass
+
+
+# Offsets from the SEV-SNP ABI spec, ATTESTATION_REPORT structure (Table 22).
+SNP_REPORT_SIZE = 0x4A0
+VERSION_OFFSET = 0x00
+CURRENT_TCB_OFFSET = 0x38
+REPORT_DATA_OFFSET = 0x50
+MEASUREMENT_OFFSET = 0x90
+REPORTED_TCB_OFFSET = 0x180
+CPUID_FAM_ID_OFFSET = 0x188
+CPUID_MOD_ID_OFFSET = 0x189
+CHIP_ID_OFFSET = 0x1A0
+COMMITTED_TCB_OFFSET = 0x1E0
+LAUNCH_TCB_OFFSET = 0x1F0
+TCB_SIZE = 8
+CHIP_ID_SIZE = 64
+REPORT_DATA_SIZE = 64
+MEASUREMENT_SIZE = 48
+
+
+@dataclass(frozen=True)
+class SNPReport:
+    raw: bytes
+
+    @property
+    def version(self) -> int:
+        return int.from_bytes(self.raw[VERSION_OFFSET : VERSION_OFFSET + 4], "little")
+
+    @property
+    def chip_id(self) -> str:
+        return self.raw[CHIP_ID_OFFSET : CHIP_ID_OFFSET + CHIP_ID_SIZE].hex()
+
+    @property
+    def report_data(self) -> bytes:
+        return self.raw[REPORT_DATA_OFFSET : REPORT_DATA_OFFSET + REPORT_DATA_SIZE]
+
+    @property
+    def measurement(self) -> str:
+        return self.raw[MEASUREMENT_OFFSET : MEASUREMENT_OFFSET + MEASUREMENT_SIZE].hex()
+
+    @property
+    def current_tcb(self) -> str:
+        return tcbm_from_tcb_bytes(self._tcb(CURRENT_TCB_OFFSET))
+
+    @property
+    def reported_tcb(self) -> str:
+        return tcbm_from_tcb_bytes(self._tcb(REPORTED_TCB_OFFSET))
+
+    @property
+    def committed_tcb(self) -> str:
+        return tcbm_from_tcb_bytes(self._tcb(COMMITTED_TCB_OFFSET))
+
+    @property
+    def launch_tcb(self) -> str:
+        return tcbm_from_tcb_bytes(self._tcb(LAUNCH_TCB_OFFSET))
+
+    @property
+    def cpuid(self) -> tuple[int, int] | None:
+        # CPUID family/model are only populated from report version 3 onwards
+        if self.version < 3:
+            return None
+        return (self.raw[CPUID_FAM_ID_OFFSET], self.raw[CPUID_MOD_ID_OFFSET])
+
+    def _tcb(self, offset: int) -> bytes:
+        return self.raw[offset : offset + TCB_SIZE]
+
+
+def tcbm_from_tcb_bytes(tcb: bytes) -> str:
+    # TCB_VERSION is a little-endian u64 whose SPL bytes sit at family-specific
+    # positions; printing it most-significant byte first gives the TCBM layout
+    # make_leaf_url slices for every product family (microcode SPL first).
+    if len(tcb) != TCB_SIZE:
+        raise ValueError(f"TCB must be {TCB_SIZE} bytes, got {len(tcb)}")
+    return tcb[::-1].hex().upper()
+
+
+def parse_report(data: bytes) -> SNPReport:
+    if len(data) != SNP_REPORT_SIZE:
+        raise ValueError(
+            f"SNP report must be {SNP_REPORT_SIZE} bytes, got {len(data)}"
+        )
+    return SNPReport(raw=bytes(data))
+
+
+def load_report(data: bytes) -> SNPReport:
+    if len(data) == SNP_REPORT_SIZE:
+        return parse_report(data)
+    text = data.decode("ascii", errors="strict").strip()
+    text = "".join(text.split())
+    if text.startswith(("0x", "0X")):
+        text = text[2:]
+    if not text or any(ch not in string.hexdigits for ch in text):
+        raise ValueError("SNP report is neither raw binary nor hex encoded")
+    return parse_report(bytes.fromhex(text))
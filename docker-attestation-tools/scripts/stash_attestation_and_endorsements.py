@@ -1,10 +1,100 @@
 import sys
 import argparse
 import base64
+import datetime
+import fcntl
 import json
-import subprocess
+import socket
 import os
 
+from amd_chain import default_verifier
+from snp_guest import BACKENDS, get_report
+from snp_report import load_report
+
+
+STASH_FORMAT_VERSION = 1
+DEFAULT_SECURITY_CONTEXT_CACHE = "/tmp/security-context-path"
+
+
+def find_security_context(cache_path=DEFAULT_SECURITY_CONTEXT_CACHE):
+    # ACI exports the directory to the container, so only scan / as a fallback
+    # and remember the answer for the next run.
+    from_env = os.environ.get("UVM_SECURITY_CONTEXT_DIR")
+    if from_env and os.path.isdir(from_env):
+        return from_env.strip("/")
+    if cache_path:
+        try:
+            with open(cache_path, "r") as f:
+                cached = f.read().strip()
+            if cached and os.path.isdir(f"/{cached}"):
+                return cached
+        except FileNotFoundError:
+            pass
+    for folder in os.listdir("/"):
+        if folder.startswith("security-context"):
+            if cache_path:
+                with open(cache_path, "w") as f:
+                    f.write(folder)
+            return folder
+    return None
+
+
+def load_host_amd_certs(security_context, verify=True):
+    with open(f"/{security_context}/host-amd-cert-base64", "r") as f:
+        caci_certs = f.read()
+    certs = json.loads(base64.b64decode(caci_certs).decode("utf-8"))
+    certs["vcekCert"] = certs["vcekCert"].replace("\\n", "\n")
+    certs["certificateChain"] = certs["certificateChain"].replace("\\n", "\n")
+    if verify:
+        default_verifier.verify_pem_chain(certs["vcekCert"], certs["certificateChain"])
+    return certs
+
+
+def get_raw_attestation(bins, source="auto", report_data=b""):
+    return get_report(report_data, backend=source, bins=bins).hex() + "\n"
+
+
+def build_stash_document(security_context, certs, raw_attestation, verified):
+    doc = {
+        "version": STASH_FORMAT_VERSION,
+        "timestamp": datetime.datetime.now(datetime.UTC).isoformat(),
+        "hostname": socket.gethostname(),
+        "node_ip": os.environ.get("Fabric_NodeIPOrFQDN"),
+        "security_context": f"/{security_context}",
+        "verified": verified,
+        "tcbm": certs.get("tcbm"),
+        "vcek": certs["vcekCert"],
+        "chain": certs["certificateChain"],
+        "report": raw_attestation.strip(),
+    }
+    try:
+        report = load_report(raw_attestation.encode("utf-8"))
+    except ValueError as e:
+        sys.stderr.write(f"Could not parse attestation report: {e}\n")
+        return doc
+    doc["report_fields"] = {
+        "version": report.version,
+        "chip_id": report.chip_id,
+        "measurement": report.measurement,
+        "report_data": report.report_data.hex(),
+        "current_tcb": report.current_tcb,
+        "reported_tcb": report.reported_tcb,
+        "committed_tcb": report.committed_tcb,
+        "launch_tcb": report.launch_tcb,
+    }
+    return doc
+
+
+def append_jsonl(path, doc):
+    line = (json.dumps(doc, separators=(",", ":")) + "\n").encode("utf-8")
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+
 if __name__ == "__main__":
     args = argparse.ArgumentParser(
         description="Stash attestation and endorsements from a C-ACI container."
@@ -15,33 +105,91 @@ if __name__ == "__main__":
         default="./bin",
         help="Path to the directory containing the sidecar-tools binaries.",
     )
+    args.add_argument(
+        "--report-source",
+        type=str,
+        choices=BACKENDS,
+        default="auto",
+        help=(
+            "How to request the attestation report. auto tries configfs-tsm, then "
+            "/dev/sev-guest in-process, then falls back to the get-snp-report binary."
+        ),
+    )
+    args.add_argument(
+        "--report-data",
+        type=str,
+        default="",
+        help="Hex encoded report_data (up to 64 bytes) to bind into the report.",
+    )
+    args.add_argument(
+        "--skip-verify",
+        action="store_true",
+        help="Do not verify the VCEK against the AMD cert chain.",
+    )
+    args.add_argument(
+        "--output-format",
+        type=str,
+        choices=["text", "json"],
+        default="text",
+        help=(
+            "text writes the PEM certs and raw attestation one after another; "
+            "json writes a single document with the report, VCEK, chain and metadata."
+        ),
+    )
+    args.add_argument(
+        "--append",
+        type=str,
+        default=None,
+        help="Append the JSON document as one line to this JSONL archive instead of stdout.",
+    )
+    args.add_argument(
+        "--security-context-cache",
+        type=str,
+        default=DEFAULT_SECURITY_CONTEXT_CACHE,
+        help="File caching the discovered security context folder. Empty to disable.",
+    )
 
+    parser = args
     args = args.parse_args()
+    try:
+        report_data = bytes.fromhex(args.report_data)
+    except ValueError:
+        parser.error("--report-data must be hex encoded")
+    if len(report_data) > 64:
+        parser.error("--report-data must be at most 64 bytes")
 
     sys.stderr.write("Finding security context folder...\n")
-    security_context = None
-    for folder in os.listdir("/"):
-        if folder.startswith("security-context"):
-            security_context = folder
-            break
+    security_context = find_security_context(args.security_context_cache)
+    if security_context is None:
+        sys.stderr.write("No security context folder found\n")
+        sys.exit(1)
 
     sys.stderr.write("Reading in certificate chain...\n")
-    with open(f"/{security_context}/host-amd-cert-base64", "r") as f:
-        caci_certs = f.read()
-    certs = json.loads(base64.b64decode(caci_certs).decode("utf-8"))
+    try:
+        certs = load_host_amd_certs(security_context, verify=not args.skip_verify)
+    except ValueError as e:
+        sys.stderr.write(f"Verification failed: {e}\n")
+        sys.exit(1)
+
+    if args.output_format == "json" or args.append:
+        raw_attestation = get_raw_attestation(args.bins, args.report_source, report_data)
+        doc = build_stash_document(
+            security_context, certs, raw_attestation, verified=not args.skip_verify
+        )
+        if args.append:
+            append_jsonl(args.append, doc)
+            sys.stderr.write(f"Appended attestation to {args.append}\n")
+        else:
+            json.dump(doc, sys.stdout, indent=2)
+            sys.stdout.write("\n")
+        sys.exit(0)
 
     sys.stderr.write("Certificate chain:\n")
 
-    vcek_cert = certs["vcekCert"]
-    vcek_cert = vcek_cert.replace("\\n", "\n")
-    sys.stdout.write(vcek_cert)
-    cert_chain = certs["certificateChain"]
-    cert_chain = cert_chain.replace("\\n", "\n")
-    sys.stdout.write(cert_chain)
+    sys.stdout.write(certs["vcekCert"])
+    sys.stdout.write(certs["certificateChain"])
 
-    raw_attestation = subprocess.run(
-        [f"{args.bins}/get-snp-report"], capture_output=True, text=True, check=True
-    ).stdout
+    raw_attestation = get_raw_attestation(args.bins, args.report_source, report_data)
 
     sys.stderr.write("\nRaw attestation: \n")
     sys.stdout.write(raw_attestation)